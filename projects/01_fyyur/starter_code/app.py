@@ -3,10 +3,11 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-import datetime
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
 from flask import (
+  Blueprint,
   Flask,
   render_template,
   request,
@@ -14,56 +15,211 @@ from flask import (
   flash,
   redirect,
   url_for,
-  jsonify
+  jsonify,
+  abort
   )
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import (
-  Formatter,
-  FileHandler
-  )
-from flask_wtf import Form
-from forms import *
-from forms import VenueForm
-from flask_migrate import Migrate
+from forms import VenueForm, ArtistForm, ShowForm
+from sqlalchemy.orm.exc import StaleDataError
 from models import (
-  app,
   db,
   Venue,
   Artist,
   Show
 )
+from search import (
+  search_by_name,
+  autocomplete,
+  index_venue,
+  index_artist,
+  index_show,
+  unindex_venue,
+  unindex_artist
+)
+from importer import fyyur_cli
+from database import (
+  init_database,
+  loaded_by_flask_command,
+  pool_stats
+)
+from counters import (
+  count_show,
+  uncount_shows
+)
+from streaming import stream_query
+from names import venue_names, artist_names
+from logs import init_logging
+from availability import (
+  MAX_AVAILABILITY_RANGE,
+  find_conflict,
+  venue_availability
+)
+from replicas import (
+  init_replicas,
+  read_only
+)
+from cache import (
+  page_cache,
+  init_page_cache,
+  cached_page,
+  page_key,
+  venue_pages,
+  artist_pages
+)
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
+# the views; create_app() registers them on each app it builds
+bp = Blueprint('fyyur', __name__)
 
-migrate = Migrate(app, db)
+SHOWS_PER_PAGE = 30
+
+# the fields of the edit forms; the seeking fields are not on them yet
+VENUE_EDIT_FIELDS = ('name', 'genres', 'address', 'city', 'state', 'phone',
+  'website', 'facebook_link', 'image_link')
+ARTIST_EDIT_FIELDS = ('name', 'genres', 'city', 'state', 'phone', 'website',
+  'facebook_link', 'image_link')
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+  # parses each of our formats once; babel and its locale data are loaded on
+  # first use, not at startup
+  import babel.core
+  import babel.dates
+  return (
+    babel.dates.parse_pattern(DATETIME_FORMATS[format]),
+    babel.core.Locale.parse(babel.dates.LC_TIME)
+  )
+
+@lru_cache(maxsize=4096)
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+  # takes datetimes as they come from the database; strings are still parsed
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  if format not in DATETIME_FORMATS:
+    import babel.dates
+    return babel.dates.format_datetime(value, format)
+  pattern, locale = datetime_pattern(format)
+  return pattern.apply(value, locale)
 
-app.jinja_env.filters['datetime'] = format_datetime
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def split_shows(entity, rows, fields):
+  # builds the detail page data for a venue or artist from rows of its shows,
+  # using the `past` flag computed in SQL against the app's clock, as the
+  # show counters are, to split past and upcoming
+  data = dict(entity.__dict__)
+  data['past_shows'] = []
+  data['upcoming_shows'] = []
+  for row in rows:
+    if row.start_time is None:
+      continue
+    details = {field: getattr(row, field) for field in fields}
+    details['start_time'] = row.start_time
+    if row.past:
+      data['past_shows'].append(details)
+    else:
+      data['upcoming_shows'].append(details)
+  data['past_shows_count'] = len(data['past_shows'])
+  data['upcoming_shows_count'] = len(data['upcoming_shows'])
+  return data
+
+def genre_filter(model):
+  # the ?genre= filter for a listing: venues or artists with all of the
+  # selected genres, or any of them with ?match=any. Both operators are
+  # answered from the GIN index on the genres column.
+  genres = request.args.getlist('genre')
+  if not genres:
+    return None
+  if request.args.get('match') == 'any':
+    return model.genres.overlap(genres)
+  return model.genres.contains(genres)
+
+def genre_facets(model, condition):
+  # the number of matching rows per genre, in one aggregate query
+  genres = db.session.query(db.func.unnest(model.genres).label('genre'))
+  if condition is not None:
+    genres = genres.filter(condition)
+  genres = genres.subquery()
+  count = db.func.count().label('count')
+  return db.session.query(genres.c.genre, count).group_by(
+    genres.c.genre).order_by(count.desc(), genres.c.genre).all()
+
+def apply_changes(entity, form, fields):
+  # copies only the form fields whose value differs from the entity, so the
+  # UPDATE touches only those columns. An empty field matches a NULL column.
+  changed = []
+  for field in fields:
+    value = form[field].data
+    current = getattr(entity, field)
+    if value == current or (value == '' and current is None):
+      continue
+    setattr(entity, field, value)
+    changed.append(field)
+  return changed
+
+def request_ids():
+  # the list of integer ids in a JSON body like {"ids": [1, 2, 3]}
+  ids = (request.get_json(silent=True) or {}).get('ids')
+  if not isinstance(ids, list) or not all(
+      isinstance(id, int) and not isinstance(id, bool) for id in ids):
+    abort(400)
+  return ids
+
+def delete_venues(venue_ids):
+  # deletes venues with one DELETE statement; their shows are removed by the
+  # database through ON DELETE CASCADE, without being loaded. Returns the
+  # names of the venues that existed.
+  stale_pages = venue_pages(*venue_ids)
+  uncount_shows(Show.venue_id.in_(venue_ids))
+  names = [name for name, in db.session.execute(
+    db.delete(Venue).where(Venue.id.in_(venue_ids)).returning(Venue.name))]
+  db.session.commit()
+  unindex_venue(*venue_ids)
+  venue_names.remove(*venue_ids)
+  page_cache.delete(*stale_pages)
+  return names
+
+def delete_artists(artist_ids):
+  stale_pages = artist_pages(*artist_ids)
+  uncount_shows(Show.artist_id.in_(artist_ids))
+  names = [name for name, in db.session.execute(
+    db.delete(Artist).where(Artist.id.in_(artist_ids)).returning(Artist.name))]
+  db.session.commit()
+  unindex_artist(*artist_ids)
+  artist_names.remove(*artist_ids)
+  page_cache.delete(*stale_pages)
+  return names
+
+def encode_cursor(show):
+  # the position of a show in the start_time ordering, for keyset pagination
+  return '{}_{}'.format(show.start_time.isoformat(), show.id)
+
+def decode_cursor(cursor):
+  try:
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -71,76 +227,97 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
 def venues():
+  # groups venues by city and state in a single ordered query; the number of
+  # upcoming shows is the venue's counter, so no shows are counted here
+  order = [Venue.state, Venue.city]
+  if request.args.get('sort') == 'popular':
+    order.append(Venue.upcoming_shows_count.desc())
+  rows = db.session.query(
+    Venue.id,
+    Venue.name,
+    Venue.city,
+    Venue.state,
+    Venue.upcoming_shows_count
+  ).order_by(*order, Venue.name, Venue.id)
+  condition = genre_filter(Venue)
+  if condition is not None:
+    rows = rows.filter(condition)
   data = []
-  venues = Venue.query.all()
-  for location in Venue.query.with_entities(Venue.city, Venue.state).distinct():
+  for (state, city), area in groupby(rows, key=lambda row: (row.state, row.city)):
     data.append({
-      "city": location.city,
-      "state": location.state,
+      "city": city,
+      "state": state,
       "venues": [{
         "id": venue.id,
-        "name": venue.name
-      } for venue in venues if
-            venue.city == location.city and venue.state == location.state
-      ]})
-  return render_template('pages/venues.html', areas=data)
-
-@app.route('/venues/search', methods=['POST'])
+        "name": venue.name,
+        "num_upcoming_shows": venue.upcoming_shows_count
+      } for venue in area]
+    })
+  return render_template('pages/venues.html', areas=data,
+    facets=genre_facets(Venue, condition),
+    genres=request.args.getlist('genre'), match=request.args.get('match'),
+    sort=request.args.get('sort'))
+
+@bp.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
-  # implements search on artists with partial string search. Ensure it is case-insensitive.
+  # implements search on venues with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  word = request.form.get('search_term').lower()
-  response = {}
-  data = []
-  for venue in Venue.query.all():
-    details = {
-      "id": venue.id,
-      "name": venue.name,
-    }
-    if word in venue.name.lower():
-      data.append(details)
-  response['count'] = len(data)
-  response['data'] = data
+  response = search_by_name(Venue, request.form.get('search_term', ''),
+    request.args.get('page', 1, type=int))
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@cached_page('venue', 'venue_id')
 def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  # replaces with real venue data from the venues table, using venue_id
-  present = datetime.now()
-  pastshows = []
-  upcomingshows = []
-  shows = Show.query.filter_by(venue_id=venue_id).join(Artist)
-  for show in shows:
-    details = [{
-        "artist_id": show.artist.id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": str(show.start_time)
-      }]
-    if show.start_time < present:
-      pastshows.extend(details)
-    else:
-      upcomingshows.extend(details)
-  data = Venue.query.get(venue_id).__dict__
-  data['past_shows'] = pastshows
-  data['upcoming_shows'] = upcomingshows
-  data['past_shows_count'] = len(pastshows)
-  data['upcoming_shows_count'] = len(upcomingshows)
+  # shows the venue page with the given venue_id, loading the venue, its shows
+  # and their artists in one query
+  rows = db.session.query(
+    Venue,
+    Show.start_time,
+    Artist.id.label('artist_id'),
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'),
+    (Show.start_time < datetime.now()).label('past')
+  ).outerjoin(Show, Show.venue_id == Venue.id).outerjoin(
+    Artist, Artist.id == Show.artist_id
+  ).filter(Venue.id == venue_id).order_by(Show.start_time).all()
+  if not rows:
+    abort(404)
+  data = split_shows(rows[0].Venue, rows,
+    ('artist_id', 'artist_name', 'artist_image_link'))
   return render_template('pages/show_venue.html', venue=data)
 
+#  Search
+#  ----------------------------------------------------------------
+
+@bp.route('/search')
+def search():
+  # autocomplete across venues, artists and upcoming shows, answered from the
+  # in-memory prefix index rather than the database
+  term = request.args.get('term', '')
+  results = autocomplete(term)
+  return jsonify({
+    'success': True,
+    'term': term,
+    'venues': results['venue'],
+    'artists': results['artist'],
+    'shows': [dict(show, start_time=show['start_time'].isoformat())
+      for show in results['show']]
+  })
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   # inserts form data as a new Venue record in the db, instead
   # modifies data to be the data object returned from db insertion
@@ -161,166 +338,167 @@ def create_venue_submission():
     )
     db.session.add(venue)
     db.session.commit()
+    index_venue(venue)
+    venue_names.set(venue.id, venue.name)
     flash('Venue ' + form.name.data + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-  # TODO: Complete this endpoint for taking a venue_id, and using
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  # deletes the venue and, in the database, its shows
   try:
-    venue = Venue.query.get(venue_id)
-    db.session.delete(venue)
-    db.session.commit()
-    flash(venue.name +  ' has been successfully deleted!')
+    name, = delete_venues([venue_id])
+    flash(name +  ' has been successfully deleted!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue could not be deleted.')
+  return jsonify({'success': True})
+
+@bp.route('/venues', methods=['DELETE'])
+def delete_venues_batch():
+  # deletes every venue in {"ids": [...]} in one transaction
+  venue_ids = request_ids()
+  try:
+    names = delete_venues(venue_ids)
   except:
     db.session.rollback()
-    flash('An error occurred. Venue ' + venue.name + ' could not be deleted.')
-  finally:
-    db.session.close()
-    return jsonify({'success': True})
+    abort(500)
+  return jsonify({'success': True, 'deleted': len(names)})
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
 def artists():
   # replaces with real data returned from querying the database
-  data = []
-  for artist in Artist.query.all():
-    details = {
-        "id": artist.id,
-        "name": artist.name,
-    }
-    data.append(details)
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  query = db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count)
+  if request.args.get('sort') == 'popular':
+    query = query.order_by(Artist.upcoming_shows_count.desc(), Artist.id)
+  else:
+    query = query.order_by(Artist.id)
+  condition = genre_filter(Artist)
+  if condition is not None:
+    query = query.filter(condition)
+  data = [{
+      "id": artist.id,
+      "name": artist.name,
+      "num_upcoming_shows": artist.upcoming_shows_count,
+    } for artist in query]
+  return render_template('pages/artists.html', artists=data,
+    facets=genre_facets(Artist, condition),
+    genres=request.args.getlist('genre'), match=request.args.get('match'),
+    sort=request.args.get('sort'))
+
+@bp.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
   # implements search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  word = request.form.get('search_term').lower()
-  response = {}
-  data = []
-  for artist in Artist.query.all():
-    details = {
-      "id": artist.id,
-      "name": artist.name,
-    }
-    if word in artist.name.lower():
-      data.append(details)
-  response['count'] = len(data)
-  response['data'] = data
+  response = search_by_name(Artist, request.form.get('search_term', ''),
+    request.args.get('page', 1, type=int))
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@cached_page('artist', 'artist_id')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # replaces with real venue data from the venues table, using venue_id
-  present = datetime.now()
-  pastshows = []
-  upcomingshows = []
-  for show in Show.query.filter_by(artist_id=artist_id):
-    venue = Venue.query.get(show.venue_id)
-    details = [{
-        "venue_id": venue.id,
-        "venue_name": venue.name,
-        "venue_image_link": venue.image_link,
-        "start_time": str(show.start_time)
-      }]
-    if show.start_time < present:
-      pastshows.extend(details)
-    else:
-      upcomingshows.extend(details)
-  data = Artist.query.get(artist_id).__dict__
-  data['past_shows'] = pastshows
-  data['upcoming_shows'] = upcomingshows
-  data['past_shows_count'] = len(pastshows)
-  data['upcoming_shows_count'] = len(upcomingshows)
+  # shows the artist page with the given artist_id, loading the artist, its
+  # shows and their venues in one query
+  rows = db.session.query(
+    Artist,
+    Show.start_time,
+    Venue.id.label('venue_id'),
+    Venue.name.label('venue_name'),
+    Venue.image_link.label('venue_image_link'),
+    (Show.start_time < datetime.now()).label('past')
+  ).outerjoin(Show, Show.artist_id == Artist.id).outerjoin(
+    Venue, Venue.id == Show.venue_id
+  ).filter(Artist.id == artist_id).order_by(Show.start_time).all()
+  if not rows:
+    abort(404)
+  data = split_shows(rows[0].Artist, rows,
+    ('venue_id', 'venue_name', 'venue_image_link'))
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   # populates form with fields from artist with ID <artist_id>
-  form = ArtistForm()
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.get_or_404(artist_id)
+  form = ArtistForm(obj=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  # takes values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
+  # takes values from the form submitted, and updates the changed columns of
+  # artist record with ID <artist_id>, unless someone else saved it since the
+  # form was loaded
   form = ArtistForm()
   try:
     artist = Artist.query.get(artist_id)
-    artist.name=form.name.data,
-    artist.genres=form.genres.data,
-    artist.city=form.city.data,
-    artist.state=form.state.data,
-    artist.phone=form.phone.data,
-    artist.website=form.website.data,
-    artist.facebook_link=form.facebook_link.data,
-    # seeking_talent=form.seeking_talent.data,
-    artist.image_link=form.image_link.data,
-    db.session.commit()
+    if form.version.data != str(artist.version):
+      raise StaleDataError()
+    changed = apply_changes(artist, form, ARTIST_EDIT_FIELDS)
+    if changed:
+      db.session.commit()
+      index_artist(artist)
+      if 'name' in changed:
+        artist_names.set(artist_id, form.name.data)
+      page_cache.delete(*artist_pages(artist_id))
     flash('Artist ' + form.name.data + ' was successfully edited!')
+  except StaleDataError:
+    db.session.rollback()
+    flash('Artist ' + form.name.data + ' was changed by someone else. Reload it and edit again.')
   except:
     db.session.rollback()
     flash('An error occurred. Artist ' + form.name.data + ' could not be edited.')
-  finally:
-    db.session.close()
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   # populates form with values from venue with ID <venue_id>
-  form = VenueForm()
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.get_or_404(venue_id)
+  form = VenueForm(obj=venue)
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  # takes values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
+  # takes values from the form submitted, and updates the changed columns of
+  # venue record with ID <venue_id>, unless someone else saved it since the
+  # form was loaded
   form = VenueForm()
   try:
     venue = Venue.query.get(venue_id)
-    venue.name=form.name.data,
-    venue.genres=form.genres.data,
-    venue.address=form.address.data,
-    venue.city=form.city.data,
-    venue.state=form.state.data,
-    venue.phone=form.phone.data,
-    venue.website=form.website.data,
-    venue.facebook_link=form.facebook_link.data,
-    # venue.seeking_talent=form.seeking_talent.data,
-    # venue.seeking_description=form.seeking_description.data,
-    venue.image_link=form.image_link.data,
-    db.session.commit()
+    if form.version.data != str(venue.version):
+      raise StaleDataError()
+    changed = apply_changes(venue, form, VENUE_EDIT_FIELDS)
+    if changed:
+      db.session.commit()
+      index_venue(venue)
+      if 'name' in changed:
+        venue_names.set(venue_id, form.name.data)
+      page_cache.delete(*venue_pages(venue_id))
     flash('Venue ' + form.name.data + ' was successfully edited!')
+  except StaleDataError:
+    db.session.rollback()
+    flash('Venue ' + form.name.data + ' was changed by someone else. Reload it and edit again.')
   except:
     db.session.rollback()
     flash('An error occurred. venue ' + form.name.data + ' could not be edited.')
-  finally:
-    db.session.close()
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
   # inserts form data as a new Venue record in the db, instead
@@ -341,95 +519,252 @@ def create_artist_submission():
     )
     db.session.add(artist)
     db.session.commit()
+    index_artist(artist)
+    artist_names.set(artist.id, artist.name)
     flash('Artist ' + form.name.data + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
-@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+@bp.route('/artists/<int:artist_id>', methods=['DELETE'])
 def delete_artist(artist_id):
   try:
-    artist = Artist.query.get(artist_id)
-    db.session.delete(artist)
-    db.session.commit()
-    flash(artist.name +  ' has been successfully deleted!')
+    name, = delete_artists([artist_id])
+    flash(name +  ' has been successfully deleted!')
   except:
     db.session.rollback()
-    flash('An error occurred. Artist ' + artist.name + ' could not be deleted.')
-  finally:
-    db.session.close()
-    return jsonify({'success': True})
+    flash('An error occurred. Artist could not be deleted.')
+  return jsonify({'success': True})
+
+@bp.route('/artists', methods=['DELETE'])
+def delete_artists_batch():
+  artist_ids = request_ids()
+  try:
+    names = delete_artists(artist_ids)
+  except:
+    db.session.rollback()
+    abort(500)
+  return jsonify({'success': True, 'deleted': len(names)})
 
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
 def shows():
-  # displays list of shwows at /shows
-  artists = Artist.query.all()
-  venues = Venue.query.all()
-  data = []
-  for show in Show.query.all():
-    artist = [artist for artist in artists if artist.id == show.artist_id][0]
-    venue = [venue for venue in venues if venue.id == show.venue_id][0]
-    details = {
-        "venue_id": venue.id,
-        "venue_name": venue.name,
-        "artist_id": artist.id,
-        "artist_name": artist.name,
-        "artist_image_link": artist.image_link,
-        "start_time": str(show.start_time)
-      }
-    data.append(details)
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+  # displays list of shows at /shows, one page at a time; `after` is the
+  # cursor of the last show on the previous page
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Venue.id.label('venue_id'),
+    Venue.name.label('venue_name'),
+    Artist.id.label('artist_id'),
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id).join(
+    Artist, Artist.id == Show.artist_id
+  ).order_by(Show.start_time, Show.id)
+  cursor = request.args.get('after')
+  if cursor:
+    query = query.filter(
+      db.tuple_(Show.start_time, Show.id) > decode_cursor(cursor))
+  rows = query.limit(SHOWS_PER_PAGE + 1).all()
+  next_cursor = None
+  if len(rows) > SHOWS_PER_PAGE:
+    rows = rows[:SHOWS_PER_PAGE]
+    next_cursor = encode_cursor(rows[-1])
+  data = [{
+      "venue_id": show.venue_id,
+      "venue_name": show.venue_name,
+      "artist_id": show.artist_id,
+      "artist_name": show.artist_name,
+      "artist_image_link": show.artist_image_link,
+      "start_time": show.start_time
+    } for show in rows]
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+
+@bp.route('/shows/create')
 def create_shows():
   # renders form
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # inserts form data as a new Show record in the db
   form = ShowForm()
+  if not form.validate():
+    flash('Show could not be listed. Pick an artist, a venue and a start time.')
+    return render_template('forms/new_show.html', form=form)
   try:
+    # one indexed probe for a show overlapping this one at the venue or
+    # with the artist
+    conflict = find_conflict(
+      form.venue_id.data, form.artist_id.data, form.start_time.data)
+    if conflict is not None:
+      db.session.rollback()
+      flash('Show could not be listed. The venue or artist is already booked at '
+        + format_datetime(conflict.start_time, 'full') + '.')
+      return render_template('pages/home.html')
     show = Show(
       venue_id=form.venue_id.data,
       artist_id=form.artist_id.data,
       start_time=form.start_time.data,
     )
     db.session.add(show)
+    count_show(show)
     db.session.commit()
+    index_show(show.id)
+    page_cache.delete(
+      page_key('venue', show.venue_id), page_key('artist', show.artist_id))
     flash('Show was successfully listed!')
   except:
     db.session.rollback()
     flash('An error occurred. Show could not be listed.')
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+#  API
+#  ----------------------------------------------------------------
+
+@bp.route('/api/v1/venues')
+def api_venues():
+  # every venue as JSON, streamed from a server-side cursor; ?format=ndjson
+  # gives one object per line
+  query = db.session.query(
+    Venue.id,
+    Venue.name,
+    Venue.genres,
+    Venue.city,
+    Venue.state,
+    Venue.address,
+    Venue.phone,
+    Venue.website,
+    Venue.facebook_link,
+    Venue.seeking_talent,
+    Venue.seeking_description,
+    Venue.image_link,
+    Venue.upcoming_shows_count,
+    Venue.past_shows_count
+  ).order_by(Venue.id)
+  condition = genre_filter(Venue)
+  if condition is not None:
+    query = query.filter(condition)
+  return stream_query(query)
+
+@bp.route('/api/v1/artists')
+def api_artists():
+  query = db.session.query(
+    Artist.id,
+    Artist.name,
+    Artist.genres,
+    Artist.city,
+    Artist.state,
+    Artist.phone,
+    Artist.website,
+    Artist.facebook_link,
+    Artist.seeking_venue,
+    Artist.seeking_description,
+    Artist.image_link,
+    Artist.upcoming_shows_count,
+    Artist.past_shows_count
+  ).order_by(Artist.id)
+  condition = genre_filter(Artist)
+  if condition is not None:
+    query = query.filter(condition)
+  return stream_query(query)
+
+@bp.route('/api/v1/venues/availability')
+def api_venue_availability():
+  # which venues of a city are free between ?start= and ?end= (ISO 8601)
+  city = request.args.get('city')
+  state = request.args.get('state')
+  try:
+    start = datetime.fromisoformat(request.args.get('start', ''))
+    end = datetime.fromisoformat(request.args.get('end', ''))
+  except ValueError:
+    abort(400)
+  if not city or not state or not start < end <= start + MAX_AVAILABILITY_RANGE:
+    abort(400)
+  free, busy = venue_availability(city, state, start, end)
+  for venue in busy:
+    for show in venue['shows']:
+      show['start_time'] = show['start_time'].isoformat()
+      show['end_time'] = show['end_time'].isoformat()
+  return jsonify({
+    'success': True,
+    'city': city,
+    'state': state,
+    'start': start.isoformat(),
+    'end': end.isoformat(),
+    'free': free,
+    'busy': busy
+  })
+
+@bp.route('/api/v1/shows')
+def api_shows():
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Venue.id.label('venue_id'),
+    Venue.name.label('venue_name'),
+    Artist.id.label('artist_id'),
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id).join(
+    Artist, Artist.id == Show.artist_id
+  ).order_by(Show.start_time, Show.id)
+  return stream_query(query)
+
+@bp.route('/cache/stats')
+def cache_stats():
+  # hit rate of the venue and artist page cache in this worker
+  return jsonify(page_cache.stats())
+
+@bp.route('/pool/stats')
+def database_pool_stats():
+  # connection pool usage and checkout waits in this worker
+  return jsonify(pool_stats())
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# App Factory.
+#----------------------------------------------------------------------------#
+
+def init_migrate(app):
+  # Flask-Migrate pulls in alembic, which only `flask db` needs. It is set up
+  # when the app is loaded by the flask command, and skipped under a WSGI
+  # server.
+  if not loaded_by_flask_command():
+    return
+  from flask_migrate import Migrate
+  Migrate(app, db)
+
+def create_app(config='config'):
+  app = Flask(__name__)
+  app.config.from_object(config)
+  init_database(app)
+  init_replicas(app)
+  db.init_app(app)
+  init_migrate(app)
+  app.cli.add_command(fyyur_cli)
+  init_page_cache(app)
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.register_blueprint(bp)
+  # JSON logs with request ids and timings, written off the request thread
+  init_logging(app)
+  return app
+
+# the app for `flask`, WSGI servers that take a module attribute and the tests
+app = create_app()
 
 #----------------------------------------------------------------------------#
 # Launch.
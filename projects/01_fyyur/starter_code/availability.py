@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+# Shows have no end time; a venue or artist is taken for this long after a
+# show starts.
+SHOW_LENGTH = timedelta(hours=3)
+
+# the longest range an availability query may cover
+MAX_AVAILABILITY_RANGE = timedelta(days=31)
+
+
+def overlapping(start, end):
+    # shows running at some point in [start, end). A show starting before
+    # `start` can still be on, so the range on start_time is widened by
+    # SHOW_LENGTH; it stays a range scan on the (id, start_time) indexes.
+    return db.and_(Show.start_time > start - SHOW_LENGTH,
+                   Show.start_time < end)
+
+
+def find_conflict(venue_id, artist_id, start_time):
+    # the show that would overlap one starting at `start_time` at the venue
+    # or with the artist, or None. The venue and artist rows are locked
+    # until the transaction ends, so a concurrent booking of either waits
+    # for this one instead of passing the same check.
+    db.session.query(Venue.id).filter(
+        Venue.id == venue_id).with_for_update().all()
+    db.session.query(Artist.id).filter(
+        Artist.id == artist_id).with_for_update().all()
+    return db.session.query(Show).filter(
+        db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+        overlapping(start_time, start_time + SHOW_LENGTH)
+    ).order_by(Show.start_time).first()
+
+
+def venue_availability(city, state, start, end):
+    # the venues of a city split into free and busy over [start, end), with
+    # the shows that make the busy ones busy, in one query
+    rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.address,
+        Show.id.label('show_id'),
+        Show.start_time
+    ).outerjoin(
+        Show, db.and_(Show.venue_id == Venue.id, overlapping(start, end))
+    ).filter(
+        Venue.city == city, Venue.state == state
+    ).order_by(Venue.name, Venue.id, Show.start_time)
+    free, busy = [], []
+    for row in rows:
+        if row.show_id is None:
+            free.append({'id': row.id, 'name': row.name, 'address': row.address})
+            continue
+        if not busy or busy[-1]['id'] != row.id:
+            busy.append({'id': row.id, 'name': row.name,
+                         'address': row.address, 'shows': []})
+        busy[-1]['shows'].append({
+            'id': row.show_id,
+            'start_time': row.start_time,
+            'end_time': row.start_time + SHOW_LENGTH,
+        })
+    return free, busy
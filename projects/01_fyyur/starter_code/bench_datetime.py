@@ -0,0 +1,53 @@
+# Per-row cost of the `datetime` Jinja filter, before and after it took
+# native datetimes.
+#
+# Usage: python bench_datetime.py [rows]
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+from app import format_datetime
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+TEMPLATE = "{% for show in shows %}<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}"
+
+
+def string_format_datetime(value, format='medium'):
+    # the filter as it was, fed str(show.start_time) by the controllers
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def render(filter, shows):
+    env = Environment()
+    env.filters['datetime'] = filter
+    template = env.from_string(TEMPLATE)
+    started = time.perf_counter()
+    template.render(shows=shows)
+    return (time.perf_counter() - started) / len(shows) * 1e6
+
+
+if __name__ == '__main__':
+    start = datetime(2035, 4, 1, 20, 0)
+    # shows start on the hour over a few weeks, so start times repeat
+    times = [start + timedelta(hours=i % 500) for i in range(ROWS)]
+    unique = [start + timedelta(minutes=i) for i in range(ROWS)]
+
+    print('{} rows, microseconds per row'.format(ROWS))
+    print('{:<34} {:>8.1f}'.format('before: str() + parse + babel', render(
+        string_format_datetime, [{'start_time': str(t)} for t in times])))
+    format_datetime.cache_clear()
+    print('{:<34} {:>8.1f}'.format('after: unique start times', render(
+        format_datetime, [{'start_time': t} for t in unique])))
+    format_datetime.cache_clear()
+    print('{:<34} {:>8.1f}'.format('after: repeating start times', render(
+        format_datetime, [{'start_time': t} for t in times])))
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import session
+
+from models import db, Show
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+
+class MemoryCache:
+    """Per-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    shared = False
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisCache:
+    """Cache shared by every worker, on top of a redis client. Eviction is
+    left to the server's maxmemory-policy (allkeys-lru)."""
+
+    shared = True
+
+    def __init__(self, client, ttl=300, prefix='fyyur:page:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class PageCache:
+    """Rendered pages keyed by entity, over a pluggable backend, counting
+    hits and misses."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCache()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        page = self.backend.get(key)
+        if page is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return page
+
+    def set(self, key, page):
+        self.backend.set(key, page)
+
+    def delete(self, *keys):
+        self.invalidations += len(keys)
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = self.invalidations = 0
+
+    @property
+    def shared(self):
+        # whether other processes, e.g. the workers seen from the flask
+        # command, read the same entries
+        return self.backend.shared
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+
+page_cache = PageCache()
+
+
+def init_page_cache(app):
+    # PAGE_CACHE_REDIS_URL shares the cache between workers; redis is only
+    # needed when it is set
+    ttl = app.config.get('PAGE_CACHE_TTL', 300)
+    redis_url = app.config.get('PAGE_CACHE_REDIS_URL')
+    if redis_url:
+        import redis
+        page_cache.backend = RedisCache(redis.Redis.from_url(redis_url), ttl=ttl)
+    else:
+        page_cache.backend = MemoryCache(
+            app.config.get('PAGE_CACHE_MAX_ENTRIES', 10000), ttl)
+
+
+def page_key(kind, id):
+    return '{}:{}'.format(kind, id)
+
+
+def cached_page(kind, arg):
+    # caches the page rendered by a detail view under `kind` and the view
+    # argument `arg`. Pages carrying a flashed message are never cached.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if session.get('_flashes'):
+                return view(**kwargs)
+            key = page_key(kind, kwargs[arg])
+            page = page_cache.get(key)
+            if page is None:
+                page = view(**kwargs)
+                page_cache.set(key, page)
+            return page
+        return wrapper
+    return decorator
+
+
+def venue_pages(*venue_ids):
+    # the venues' pages and the pages of artists listing a show there
+    return [page_key('venue', venue_id) for venue_id in venue_ids] + [
+        page_key('artist', artist_id) for artist_id, in db.session.query(
+            Show.artist_id).filter(Show.venue_id.in_(venue_ids)).distinct()
+    ]
+
+
+def artist_pages(*artist_ids):
+    return [page_key('artist', artist_id) for artist_id in artist_ids] + [
+        page_key('venue', venue_id) for venue_id, in db.session.query(
+            Show.venue_id).filter(Show.artist_id.in_(artist_ids)).distinct()
+    ]
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count and past_shows_count so the
+# listings never count shows. Every path that adds or removes shows adjusts
+# them in its own transaction, and bulk loads once per batch; Show.is_past
+# records which of the two counters a show is in, and rollover() moves shows
+# across as they start.
+
+
+def counter(model, is_past):
+    if is_past:
+        return model.past_shows_count
+    return model.upcoming_shows_count
+
+
+def adjust(model, entity_id, is_past, delta):
+    # counter updates are done in SQL so concurrent requests cannot lose one
+    column = counter(model, is_past)
+    db.session.query(model).filter(model.id == entity_id).update(
+        {column: column + delta}, synchronize_session=False)
+
+
+def count_show(show, now=None):
+    # call after adding a show and before committing
+    show.is_past = show.start_time <= (now or datetime.now())
+    adjust(Venue, show.venue_id, show.is_past, 1)
+    adjust(Artist, show.artist_id, show.is_past, 1)
+
+
+def count_batch(connection, shows, now=None):
+    # call with the rows of a bulk show insert, in its transaction: sets each
+    # row's is_past and adds the batch to the counters with one UPDATE ...
+    # FROM per table
+    now = now or datetime.now()
+    for show in shows:
+        show['is_past'] = show['start_time'] <= now
+    for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        totals = {}
+        for show in shows:
+            upcoming, past = totals.get(show[key], (0, 0))
+            if show['is_past']:
+                past += 1
+            else:
+                upcoming += 1
+            totals[show[key]] = (upcoming, past)
+        if not totals:
+            continue
+        counts = db.values(
+            db.column('id', db.Integer),
+            db.column('upcoming', db.Integer),
+            db.column('past', db.Integer),
+            name='counts'
+        ).data([(id,) + total for id, total in totals.items()])
+        table = model.__table__
+        connection.execute(db.update(table).where(table.c.id == counts.c.id).values({
+            table.c.upcoming_shows_count: table.c.upcoming_shows_count + counts.c.upcoming,
+            table.c.past_shows_count: table.c.past_shows_count + counts.c.past,
+        }))
+
+
+def uncount_shows(condition):
+    # call before deleting the shows matching `condition`; one UPDATE ...
+    # FROM per table, however many venues and artists they touch
+    for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        counts = db.session.query(
+            key.label('id'),
+            db.func.count(Show.id).filter(Show.is_past.is_(False)).label('upcoming'),
+            db.func.count(Show.id).filter(Show.is_past).label('past')
+        ).filter(condition).group_by(key).subquery()
+        db.session.query(model).filter(model.id == counts.c.id).update({
+            model.upcoming_shows_count: model.upcoming_shows_count - counts.c.upcoming,
+            model.past_shows_count: model.past_shows_count - counts.c.past,
+        }, synchronize_session=False)
+
+
+# One statement: the shows that started since the last run are marked past,
+# and each venue's and artist's counters move by how many of its shows did.
+ROLLOVER_SQL = """
+WITH moved AS (
+    UPDATE show SET is_past = true
+    WHERE NOT is_past AND start_time <= :now
+    RETURNING venue_id, artist_id
+), venues AS (
+    UPDATE venue
+    SET upcoming_shows_count = upcoming_shows_count - moved.count,
+        past_shows_count = past_shows_count + moved.count
+    FROM (SELECT venue_id, count(*) FROM moved GROUP BY venue_id) AS moved
+    WHERE venue.id = moved.venue_id
+    RETURNING venue.id
+), artists AS (
+    UPDATE artist
+    SET upcoming_shows_count = upcoming_shows_count - moved.count,
+        past_shows_count = past_shows_count + moved.count
+    FROM (SELECT artist_id, count(*) FROM moved GROUP BY artist_id) AS moved
+    WHERE artist.id = moved.artist_id
+    RETURNING artist.id
+)
+SELECT (SELECT array_agg(id ORDER BY id) FROM venues),
+       (SELECT array_agg(id ORDER BY id) FROM artists)
+"""
+
+
+def rollover(now=None):
+    # moves shows that have started from the upcoming to the past counters.
+    # Returns the ids of the venues and artists that changed.
+    venue_ids, artist_ids = db.session.execute(
+        db.text(ROLLOVER_SQL), {'now': now or datetime.now()}).one()
+    db.session.commit()
+    return venue_ids or [], artist_ids or []
+
+
+def recount(now=None):
+    # recomputes every counter from the show table, to repair drift
+    now = now or datetime.now()
+    db.session.query(Show).update(
+        {Show.is_past: Show.start_time <= now}, synchronize_session=False)
+    for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        for is_past in (False, True):
+            count = db.session.query(db.func.count(Show.id)).filter(
+                key == model.id, Show.is_past.is_(is_past)
+            ).scalar_subquery()
+            db.session.query(model).update(
+                {counter(model, is_past): count}, synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import click
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+
+class PoolMetrics:
+    """Checkout counts and the time requests spent waiting for a connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            pool_metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def loaded_by_flask_command():
+    # the flask command loads the app inside a click context; WSGI servers
+    # and scripts do not
+    return click.get_current_context(silent=True) is not None
+
+
+def engine_options(app):
+    # builds SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings. The
+    # statement timeout is for serving requests; `flask db`, `flask fyyur`
+    # and `flask shell` run long statements and get no limit.
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_POOL_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+    }
+    if app.config['DB_STATEMENT_TIMEOUT'] and not loaded_by_flask_command():
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(
+                app.config['DB_STATEMENT_TIMEOUT'])
+        }
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    return options
+
+
+def init_database(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
+
+    @app.teardown_request
+    def end_session(exception=None):
+        # one session per request: whatever a handler left uncommitted is
+        # rolled back and the connection goes back to the pool here
+        if exception is not None:
+            db.session.rollback()
+        db.session.remove()
+
+
+def pool_stats():
+    pool = db.engine.pool
+    with pool_metrics.lock:
+        checkouts = pool_metrics.checkouts
+        stats = {
+            'checkouts': checkouts,
+            'timeouts': pool_metrics.timeouts,
+            'wait_avg_ms': pool_metrics.wait_total / checkouts * 1000 if checkouts else 0.0,
+            'wait_max_ms': pool_metrics.wait_max * 1000,
+        }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'idle': pool.checkedin(),
+        })
+    return stats
@@ -0,0 +1,129 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# (city, state, weight): a handful of big music cities hold most listings
+CITIES = [
+    ('New York', 'NY', 20), ('Los Angeles', 'CA', 16), ('Chicago', 'IL', 10),
+    ('San Francisco', 'CA', 9), ('Nashville', 'TN', 8), ('Austin', 'TX', 8),
+    ('Seattle', 'WA', 6), ('New Orleans', 'LA', 6), ('Atlanta', 'GA', 5),
+    ('Boston', 'MA', 5), ('Denver', 'CO', 4), ('Portland', 'OR', 4),
+    ('Philadelphia', 'PA', 4), ('Detroit', 'MI', 3), ('Minneapolis', 'MN', 3),
+    ('Miami', 'FL', 3), ('Memphis', 'TN', 2), ('Kansas City', 'MO', 2),
+    ('Salt Lake City', 'UT', 1), ('Burlington', 'VT', 1),
+]
+
+# (genre, weight), using the choices offered by the forms
+GENRES = [
+    ('Rock n Roll', 14), ('Pop', 12), ('Hip-Hop', 10), ('Jazz', 9),
+    ('Electronic', 8), ('Alternative', 8), ('R&B', 7), ('Country', 6),
+    ('Folk', 5), ('Blues', 5), ('Soul', 4), ('Classical', 4), ('Punk', 4),
+    ('Heavy Metal', 4), ('Reggae', 3), ('Funk', 3), ('Instrumental', 2),
+    ('Musical Theatre', 1), ('Other', 1),
+]
+
+VENUE_WORDS = (
+    ['The', 'Blue', 'Velvet', 'Golden', 'Electric', 'Old', 'Red', 'Silver',
+     'Midnight', 'Crooked'],
+    ['Note', 'Room', 'Lantern', 'Owl', 'Anchor', 'Door', 'Barrel', 'Whistle',
+     'Rose', 'Hop'],
+    ['Bar', 'Hall', 'Lounge', 'Club', 'Theatre', 'Cafe', 'Ballroom', 'Tavern',
+     'Music House', 'Stage'],
+)
+
+ARTIST_WORDS = (
+    ['The', 'Wild', 'Quiet', 'Electric', 'Lonesome', 'Neon', 'Velvet',
+     'Broken', 'Northern', 'Sunday'],
+    ['Sax', 'Pines', 'Petals', 'Wolves', 'Rivers', 'Hearts', 'Strings',
+     'Echoes', 'Lights', 'Kids'],
+    ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project', 'Club',
+     'Revival', 'Ensemble', 'Choir'],
+)
+
+
+class Weighted:
+    """O(log n) weighted picks from a fixed population."""
+
+    def __init__(self, items, weights):
+        self.items = items
+        self.cum_weights = list(accumulate(weights))
+
+    def pick(self, rng, k=1):
+        return rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+
+def zipf(count):
+    # a few venues and artists get most of the shows
+    return Weighted(range(1, count + 1), [1 / rank for rank in range(1, count + 1)])
+
+
+def pick_genres(rng, genres):
+    return sorted(set(genres.pick(rng, k=rng.randint(1, 3))))
+
+
+def name(rng, words, i):
+    return '{} {} {} {}'.format(*(rng.choice(part) for part in words), i)
+
+
+def generate_venues(count, seed=0):
+    rng = random.Random('venues-{}'.format(seed))
+    cities = Weighted(CITIES, [weight for _, _, weight in CITIES])
+    genres = Weighted([genre for genre, _ in GENRES], [w for _, w in GENRES])
+    for i in range(1, count + 1):
+        city, state, _ = cities.pick(rng)[0]
+        yield {
+            'id': i,
+            'name': name(rng, VENUE_WORDS, i),
+            'genres': pick_genres(rng, genres),
+            'address': '{} {} Street'.format(rng.randint(1, 9999), rng.choice(VENUE_WORDS[1])),
+            'city': city,
+            'state': state,
+            'phone': '{:03}-{:03}-{:04}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'website': 'https://venue{}.example.com'.format(i),
+            'facebook_link': 'https://www.facebook.com/venue{}'.format(i),
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': None,
+            'image_link': None,
+        }
+
+
+def generate_artists(count, seed=0):
+    rng = random.Random('artists-{}'.format(seed))
+    cities = Weighted(CITIES, [weight for _, _, weight in CITIES])
+    genres = Weighted([genre for genre, _ in GENRES], [w for _, w in GENRES])
+    for i in range(1, count + 1):
+        city, state, _ = cities.pick(rng)[0]
+        yield {
+            'id': i,
+            'name': name(rng, ARTIST_WORDS, i),
+            'genres': pick_genres(rng, genres),
+            'city': city,
+            'state': state,
+            'phone': '{:03}-{:03}-{:04}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'website': 'https://artist{}.example.com'.format(i),
+            'facebook_link': 'https://www.facebook.com/artist{}'.format(i),
+            'seeking_venue': rng.random() < 0.4,
+            'seeking_description': None,
+            'image_link': None,
+        }
+
+
+def generate_shows(count, venues, artists, seed=0, start=None):
+    # shows spread over a year either side of `start`, on the hour in the
+    # evening, with venue and artist popularity following a zipf curve
+    rng = random.Random('shows-{}'.format(seed))
+    start = start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    venue_ids = zipf(venues)
+    artist_ids = zipf(artists)
+    for i in range(1, count + 1):
+        yield {
+            'id': i,
+            'venue_id': venue_ids.pick(rng)[0],
+            'artist_id': artist_ids.pick(rng)[0],
+            'start_time': start + timedelta(
+                days=rng.randint(-365, 365), hours=rng.randint(18, 23)),
+        }
@@ -1,14 +1,88 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, HiddenField
 from wtforms.validators import DataRequired, AnyOf, URL
 
+from names import venue_names, artist_names
+
+class ChoiceRegistry:
+    """A fixed list of choices, built once at import and shared by every form
+    instance, with a frozenset of the values for O(1) validation."""
+
+    def __init__(self, values):
+        self.choices = tuple((value, value) for value in values)
+        self.values = frozenset(values)
+
+    def __contains__(self, value):
+        return value in self.values
+
+STATES = ChoiceRegistry((
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL',
+    'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME',
+    'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH',
+    'OK', 'OR', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'PA', 'RI',
+    'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI',
+    'WY',
+))
+
+GENRES = ChoiceRegistry((
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic',
+    'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental',
+    'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B',
+    'Reggae', 'Rock n Roll', 'Soul', 'Other',
+))
+
+class RegistrySelectField(SelectField):
+    """SelectField over a ChoiceRegistry. Every form shares the registry's
+    tuple instead of copying the choices into a new list, and the value is
+    checked against the set instead of scanning the choices."""
+
+    def __init__(self, label=None, validators=None, registry=None, **kwargs):
+        super().__init__(label, validators, **kwargs)
+        self.choices = registry.choices
+        self.registry = registry
+
+    def pre_validate(self, form):
+        if self.data not in self.registry:
+            raise ValueError(self.gettext('Not a valid choice'))
+
+class RegistrySelectMultipleField(SelectMultipleField):
+
+    def __init__(self, label=None, validators=None, registry=None, **kwargs):
+        super().__init__(label, validators, **kwargs)
+        self.choices = registry.choices
+        self.registry = registry
+
+    def pre_validate(self, form):
+        for value in self.data or ():
+            if value not in self.registry:
+                raise ValueError(self.gettext("'%(value)s' is not a valid choice for this field") % dict(value=value))
+
+class IndexSelectField(SelectField):
+    """Picker of a venue or artist id, backed by a NameIndex. Its choices are
+    only read when the field is rendered, and a submitted id is checked with
+    a dict lookup."""
+
+    def __init__(self, label=None, validators=None, index=None, **kwargs):
+        super().__init__(label, validators, coerce=int, **kwargs)
+        self.index = index
+
+    def iter_choices(self):
+        for value, label in self.index.choices():
+            yield (value, label, value == self.data)
+
+    def pre_validate(self, form):
+        if self.data is None or self.data not in self.index:
+            raise ValueError(self.gettext('Not a valid choice'))
+
 class ShowForm(FlaskForm):
-    artist_id = StringField(
-        'artist_id'
+    artist_id = IndexSelectField(
+        'artist_id', validators=[DataRequired()],
+        index=artist_names
     )
-    venue_id = StringField(
-        'venue_id'
+    venue_id = IndexSelectField(
+        'venue_id', validators=[DataRequired()],
+        index=venue_names
     )
     start_time = DateTimeField(
         'start_time',
@@ -23,61 +97,9 @@ class VenueForm(FlaskForm):
     city = StringField(
         'city', validators=[DataRequired()]
     )
-    state = SelectField(
+    state = RegistrySelectField(
         'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+        registry=STATES
     )
     address = StringField(
         'address', validators=[DataRequired()]
@@ -88,30 +110,9 @@ class VenueForm(FlaskForm):
     image_link = StringField(
         'image_link'
     )
-    genres = SelectMultipleField(
-        # TODO implement enum restriction
+    genres = RegistrySelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        registry=GENRES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -125,6 +126,10 @@ class VenueForm(FlaskForm):
     seeking_description = StringField(
         'seeking_description'
     )
+    # the version of the venue the edit form was filled from
+    version = HiddenField(
+        'version'
+    )
 
 class ArtistForm(FlaskForm):
     name = StringField(
@@ -133,61 +138,9 @@ class ArtistForm(FlaskForm):
     city = StringField(
         'city', validators=[DataRequired()]
     )
-    state = SelectField(
+    state = RegistrySelectField(
         'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+        registry=STATES
     )
     phone = StringField(
         # TODO implement validation logic for state
@@ -196,30 +149,9 @@ class ArtistForm(FlaskForm):
     image_link = StringField(
         'image_link'
     )
-    genres = SelectMultipleField(
-        # TODO implement enum restriction
+    genres = RegistrySelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        registry=GENRES
     )
     facebook_link = StringField(
         # TODO implement enum restriction
@@ -234,5 +166,8 @@ class ArtistForm(FlaskForm):
     seeking_description = StringField(
         'seeking_description'
     )
+    version = HiddenField(
+        'version'
+    )
 
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+
+from cache import page_cache, page_key
+from counters import count_batch, rollover
+from datagen import generate_venues, generate_artists, generate_shows
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur data management commands.')
+
+IMPORT_BATCH_SIZE = 5000
+
+# form, model and the form fields copied to columns, per kind of row
+KINDS = {
+    'venue': (VenueForm, Venue, (
+        'name', 'city', 'state', 'address', 'phone', 'image_link', 'genres',
+        'facebook_link', 'website', 'seeking_talent', 'seeking_description',
+    )),
+    'artist': (ArtistForm, Artist, (
+        'name', 'city', 'state', 'phone', 'image_link', 'genres',
+        'facebook_link', 'website', 'seeking_venue', 'seeking_description',
+    )),
+    'show': (ShowForm, Show, ('venue_id', 'artist_id', 'start_time')),
+}
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n')
+
+
+def read_rows(path):
+    # streams rows from a .csv or .jsonl file; in csv files genres are
+    # separated by commas within the field
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                if 'genres' in row:
+                    row['genres'] = [
+                        genre.strip() for genre in row['genres'].split(',')
+                        if genre.strip()
+                    ]
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            formdata.setlist(key, [str(item) for item in value])
+        elif isinstance(value, bool):
+            if value:
+                formdata[key] = 'y'
+        elif value is not None:
+            if key.startswith('seeking_') and str(value).lower() in FALSE_VALUES:
+                continue
+            formdata[key] = str(value)
+    return formdata
+
+
+def validate_row(kind, row):
+    # returns the column values for a row, or the form errors if it would
+    # have been rejected by the create form
+    form_class, model, fields = KINDS[kind]
+    form = form_class(formdata=to_formdata(row), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    values = {field: form[field].data for field in fields}
+    if kind == 'show':
+        try:
+            values['venue_id'] = int(values['venue_id'])
+            values['artist_id'] = int(values['artist_id'])
+        except (TypeError, ValueError):
+            return None, {'venue_id/artist_id': ['Not a valid id.']}
+    if row.get('id') not in (None, ''):
+        values['id'] = int(row['id'])
+    return values, None
+
+
+def write_batch(model, batch):
+    # one executemany INSERT per batch, committed as its own transaction
+    # together with the counters of the batch's shows
+    with db.engine.begin() as connection:
+        if model is Show:
+            count_batch(connection, batch)
+        connection.execute(model.__table__.insert(), batch)
+
+
+def reset_sequence(model):
+    # rows imported with explicit ids leave the id sequence behind
+    if db.engine.dialect.name == 'postgresql':
+        table = model.__tablename__
+        db.session.execute(
+            "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM {0}), 1))".format(table))
+        db.session.commit()
+
+
+@fyyur_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(sorted(KINDS)), required=True,
+              help='What the rows describe.')
+@click.option('--offset', default=0, show_default=True,
+              help='Number of rows to skip, to resume an earlier import.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True,
+              help='Rows written per transaction.')
+def import_command(path, kind, offset, batch_size):
+    """Bulk load venues, artists or shows from a CSV or JSONL file.
+
+    Rows are validated with the same rules as the create forms; rejected
+    rows are reported and skipped. After every committed batch the offset
+    to pass to --offset to resume is printed.
+    """
+    model = KINDS[kind][1]
+    started = time.perf_counter()
+    position = offset
+    imported = rejected = 0
+    explicit_ids = False
+    batch = []
+
+    def flush():
+        nonlocal imported, batch
+        write_batch(model, batch)
+        imported += len(batch)
+        batch = []
+        rate = imported / (time.perf_counter() - started)
+        click.echo('{} rows imported, {} rejected, {:.0f} rows/s '
+                   '(resume with --offset {})'.format(
+                       imported, rejected, rate, position))
+
+    for number, row in enumerate(read_rows(path)):
+        if number < offset:
+            continue
+        values, errors = validate_row(kind, row)
+        position = number + 1
+        if errors:
+            rejected += 1
+            click.echo('row {}: {}'.format(number, errors), err=True)
+            continue
+        explicit_ids = explicit_ids or 'id' in values
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if explicit_ids:
+        reset_sequence(model)
+
+    elapsed = time.perf_counter() - started
+    click.echo('Imported {} {} rows from {} in {:.2f}s ({:.0f} rows/s), '
+               '{} rejected.'.format(imported, kind, os.path.basename(path),
+                                      elapsed, imported / elapsed if elapsed else 0,
+                                      rejected))
+
+
+@fyyur_cli.command('generate')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=1000, show_default=True)
+@click.option('--shows', default=10000, show_default=True)
+@click.option('--seed', default=0, show_default=True,
+              help='The same seed always produces the same data.')
+@click.option('--replace', is_flag=True,
+              help='Delete existing venues, artists and shows first.')
+def generate_command(venues, artists, shows, seed, replace):
+    """Fill the database with synthetic venues, artists and shows."""
+    if replace:
+        for model in (Show, Venue, Artist):
+            db.session.query(model).delete()
+        db.session.commit()
+    elif any(db.session.query(model.id).first() for model in (Show, Venue, Artist)):
+        raise click.ClickException(
+            'The database already has data; pass --replace to delete it.')
+
+    for model, rows in ((Venue, generate_venues(venues, seed)),
+                        (Artist, generate_artists(artists, seed)),
+                        (Show, generate_shows(shows, venues, artists, seed))):
+        started = time.perf_counter()
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                write_batch(model, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            write_batch(model, batch)
+            count += len(batch)
+        reset_sequence(model)
+        click.echo('Generated {} {} rows in {:.2f}s.'.format(
+            count, model.__tablename__, time.perf_counter() - started))
+
+
+@fyyur_cli.command('rollover')
+def rollover_command():
+    """Move shows that have started from upcoming to past.
+
+    Updates the upcoming and past show counters of their venues and
+    artists. Run it periodically, e.g. every few minutes from cron; each
+    run only touches the shows that started since the previous one.
+    """
+    started = time.perf_counter()
+    venue_ids, artist_ids = rollover()
+    # the detail pages of those venues and artists list the shows as upcoming.
+    # Only a shared cache can be reached from this process; the workers' own
+    # caches drop the pages within PAGE_CACHE_TTL
+    if page_cache.shared:
+        page_cache.delete(*[page_key('venue', id) for id in venue_ids] +
+                          [page_key('artist', id) for id in artist_ids])
+    click.echo('Rolled over shows of {} venues and {} artists in {:.2f}s.'.format(
+        len(venue_ids), len(artist_ids), time.perf_counter() - started))
@@ -0,0 +1,183 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import (
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Logging.
+#----------------------------------------------------------------------------#
+
+# one record per request, with its timings; the slow request log
+request_logger = logging.getLogger('fyyur.request')
+
+# request fields copied onto every record logged while handling a request
+REQUEST_FIELDS = ('request_id', 'method', 'route', 'path')
+
+# the listener writing LOG_FILE, once init_logging has started it
+file_listener = None
+
+# fields of the per-request record
+TIMING_FIELDS = ('status', 'duration_ms', 'db_ms', 'db_queries', 'render_ms')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in REQUEST_FIELDS + TIMING_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class RequestQueueHandler(QueueHandler):
+    """Hands records to the listener thread, so the request never waits for
+    the disk. The request fields are added here, on the request's thread."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # what is left must be picklable and not refer to the request
+        record.msg, record.args, record.exc_info = record.message, None, None
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule else None
+            record.path = request.path
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through `rate` of the INFO and lower records; warnings and errors
+    always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def listen(loggers, handler, level=logging.INFO, filters=()):
+    # routes the loggers' records through a queue to `handler` on a
+    # background thread, and returns the started listener
+    records = queue.SimpleQueue()
+    queue_handler = RequestQueueHandler(records)
+    for log_filter in filters:
+        queue_handler.addFilter(log_filter)
+    for logger in loggers:
+        logger.addHandler(queue_handler)
+        logger.setLevel(level)
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def record_query_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def record_query_end(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context():
+        g.db_time = g.get('db_time', 0.0) + elapsed
+        g.db_queries = g.get('db_queries', 0) + 1
+
+
+def discard_query_start(exception_context):
+    # after_cursor_execute does not run for a failing statement, so its start
+    # time is dropped here; otherwise the connection's list keeps growing
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def record_render_start(app, template, context):
+    g.render_started = time.perf_counter()
+
+
+def record_render_end(app, template, context):
+    g.render_time = g.get('render_time', 0.0) + (
+        time.perf_counter() - g.pop('render_started'))
+
+
+def init_logging(app):
+    # every request gets an id (X-Request-ID, or a new one) and is timed, in
+    # total and in the database and templates. Outside debug mode records
+    # are written as JSON to LOG_FILE from a background thread.
+    # the engine events are global; each app built by create_app() shares them
+    if not event.contains(Engine, 'before_cursor_execute', record_query_start):
+        event.listen(Engine, 'before_cursor_execute', record_query_start)
+        event.listen(Engine, 'after_cursor_execute', record_query_end)
+        event.listen(Engine, 'handle_error', discard_query_start)
+    before_render_template.connect(record_render_start, app)
+    template_rendered.connect(record_render_end, app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def log_request(response):
+        if 'request_started' not in g:
+            return response
+        duration = (time.perf_counter() - g.request_started) * 1000
+        slow = duration >= app.config['LOG_SLOW_REQUEST_MS']
+        request_logger.log(
+            logging.WARNING if slow or response.status_code >= 500 else logging.INFO,
+            'slow request' if slow else 'request',
+            extra={
+                'status': response.status_code,
+                'duration_ms': round(duration, 2),
+                'db_ms': round(g.get('db_time', 0.0) * 1000, 2),
+                'db_queries': g.get('db_queries', 0),
+                'render_ms': round(g.get('render_time', 0.0) * 1000, 2),
+            })
+        response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    # the loggers are shared by every app of the process, so the file is only
+    # attached once
+    global file_listener
+    if not app.debug and file_listener is None:
+        handler = RotatingFileHandler(
+            app.config['LOG_FILE'],
+            maxBytes=app.config['LOG_MAX_BYTES'],
+            backupCount=app.config['LOG_BACKUP_COUNT'])
+        handler.setFormatter(JsonFormatter())
+        file_listener = listen(
+            [app.logger, request_logger], handler,
+            filters=[SamplingFilter(app.config['LOG_SAMPLE_RATE'])])
+        atexit.register(file_listener.stop)
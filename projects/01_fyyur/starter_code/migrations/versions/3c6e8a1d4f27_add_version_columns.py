@@ -0,0 +1,26 @@
+"""add version columns
+
+Revision ID: 3c6e8a1d4f27
+Revises: b7d84f1e2c90
+Create Date: 2026-10-18 16:20:09.351872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c6e8a1d4f27'
+down_revision = 'b7d84f1e2c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('artist', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('artist', 'version')
+    op.drop_column('venue', 'version')
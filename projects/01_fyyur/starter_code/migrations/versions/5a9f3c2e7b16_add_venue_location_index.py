@@ -0,0 +1,24 @@
+"""add venue location index
+
+Revision ID: 5a9f3c2e7b16
+Revises: e41b7d09c6a5
+Create Date: 2026-10-18 15:11:48.203917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f3c2e7b16'
+down_revision = 'e41b7d09c6a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city', table_name='venue')
@@ -0,0 +1,30 @@
+"""cascade show deletes
+
+Revision ID: b7d84f1e2c90
+Revises: 5a9f3c2e7b16
+Create Date: 2026-10-18 15:48:22.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d84f1e2c90'
+down_revision = '5a9f3c2e7b16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'])
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'])
@@ -0,0 +1,26 @@
+"""add genre indexes
+
+Revision ID: c83a5e07d1f2
+Revises: 9d2c6e1f0b84
+Create Date: 2026-10-18 11:26:05.811374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83a5e07d1f2'
+down_revision = '9d2c6e1f0b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_venue_genres', table_name='venue')
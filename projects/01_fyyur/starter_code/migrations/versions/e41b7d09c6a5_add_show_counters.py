@@ -0,0 +1,49 @@
+"""add show counters
+
+Revision ID: e41b7d09c6a5
+Revises: c83a5e07d1f2
+Create Date: 2026-10-18 14:02:37.519204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7d09c6a5'
+down_revision = 'c83a5e07d1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('venue', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artist', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('show', sa.Column('is_past', sa.Boolean(), server_default='false', nullable=False))
+    op.create_index('ix_show_upcoming_start_time', 'show', ['start_time'], unique=False, postgresql_where=sa.text('NOT is_past'))
+
+    # backfill from the existing shows. start_time is a naive local time, so
+    # it is compared with the app's clock, as the app does, not the
+    # database's now(), which depends on the session time zone.
+    op.execute(sa.text("UPDATE show SET is_past = start_time <= :now")
+               .bindparams(now=datetime.now()))
+    for table, key in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.execute(
+            "UPDATE {0} SET "
+            "upcoming_shows_count = (SELECT count(*) FROM show "
+            "WHERE show.{1} = {0}.id AND NOT show.is_past), "
+            "past_shows_count = (SELECT count(*) FROM show "
+            "WHERE show.{1} = {0}.id AND show.is_past)".format(table, key))
+
+
+def downgrade():
+    op.drop_index('ix_show_upcoming_start_time', table_name='show')
+    op.drop_column('show', 'is_past')
+    op.drop_column('artist', 'past_shows_count')
+    op.drop_column('artist', 'upcoming_shows_count')
+    op.drop_column('venue', 'past_shows_count')
+    op.drop_column('venue', 'upcoming_shows_count')
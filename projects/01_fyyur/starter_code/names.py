@@ -0,0 +1,87 @@
+import threading
+import time
+
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Name indexes.
+#----------------------------------------------------------------------------#
+
+# how long a worker trusts its indexes before reloading them, which bounds how
+# long a rename in another worker shows the old name in the pickers
+NAME_INDEX_MAX_AGE = 300
+
+
+class NameIndex:
+    """id -> name of every row of a model, for the show form's pickers.
+
+    Loaded on first use and kept current by the write handlers. Lookups of
+    ids it has not seen fall back to the database, so a venue created by
+    another worker is accepted straight away.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.names = {}
+            self.sorted = None
+            self.loaded_at = None
+
+    def is_stale(self):
+        return (self.loaded_at is None or
+                time.monotonic() - self.loaded_at > NAME_INDEX_MAX_AGE)
+
+    def load(self):
+        names = dict(db.session.query(self.model.id, self.model.name))
+        with self.lock:
+            self.names = names
+            self.sorted = None
+            self.loaded_at = time.monotonic()
+
+    def loaded(self):
+        if self.is_stale():
+            self.load()
+        return self.names
+
+    def __contains__(self, id):
+        if id in self.loaded():
+            return True
+        name = db.session.query(self.model.name).filter(
+            self.model.id == id).scalar()
+        if name is None:
+            return False
+        self.set(id, name)
+        return True
+
+    def choices(self):
+        # (id, name) pairs ordered by name, rebuilt only after a change
+        names = self.loaded()
+        with self.lock:
+            if self.sorted is None:
+                self.sorted = tuple(sorted(
+                    names.items(), key=lambda item: ((item[1] or '').lower(), item[0])))
+            return self.sorted
+
+    def set(self, id, name):
+        # call after a row is created or renamed
+        if self.is_stale():
+            return
+        with self.lock:
+            self.names[id] = name
+            self.sorted = None
+
+    def remove(self, *ids):
+        if self.is_stale():
+            return
+        with self.lock:
+            for id in ids:
+                self.names.pop(id, None)
+            self.sorted = None
+
+
+venue_names = NameIndex(Venue)
+artist_names = NameIndex(Artist)
@@ -0,0 +1,77 @@
+import random
+import time
+
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+
+class RoutingSession(SignallingSession):
+    """Session that runs the queries of read-only requests on the replica
+    chosen for the request. Flushes always go to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('replica') if has_app_context() else None
+        if replica is not None and not self._flushing:
+            return self.db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+    @property
+    def db(self):
+        return self.app.extensions['sqlalchemy'].db
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def read_only(view):
+    # marks a view that only reads, so it can use a replica even though it
+    # is reached with POST (the search forms)
+    view.read_only = True
+    return view
+
+
+def replica_binds(app):
+    # the bind keys of the configured replicas, added to SQLALCHEMY_BINDS
+    # on first use
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    binds = app.config.get('SQLALCHEMY_BINDS') or {}
+    keys = ['replica_{}'.format(number) for number in range(len(uris))]
+    if any(binds.get(key) != uri for key, uri in zip(keys, uris)):
+        app.config['SQLALCHEMY_BINDS'] = dict(binds, **dict(zip(keys, uris)))
+    return keys
+
+
+def is_read_request():
+    view = current_app.view_functions.get(request.endpoint)
+    return (request.method in ('GET', 'HEAD')
+            or getattr(view, 'read_only', False))
+
+
+def init_replicas(app):
+
+    @app.before_request
+    def choose_replica():
+        # reads go to a random replica, unless this client wrote something
+        # within the last REPLICA_READ_YOUR_WRITES seconds
+        g.replica = None
+        keys = replica_binds(current_app)
+        if not keys or not is_read_request():
+            return
+        window = current_app.config.get('REPLICA_READ_YOUR_WRITES', 0)
+        if time.time() - session.get('_last_write', 0) < window:
+            return
+        g.replica = random.choice(keys)
+
+    @app.after_request
+    def remember_write(response):
+        if not is_read_request():
+            session['_last_write'] = time.time()
+        return response
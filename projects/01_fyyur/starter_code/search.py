@@ -0,0 +1,310 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+# whether the database behind each engine url has pg_trgm installed
+trigram_support = {}
+
+
+def has_trigram_support():
+    # pg_trgm is installed by the migrations; databases built another way
+    # (db.create_all(), sqlite) fall back to plain ILIKE ordered by name
+    url = str(db.engine.url)
+    if url not in trigram_support:
+        supported = False
+        if db.engine.dialect.name == 'postgresql':
+            supported = db.session.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            ).scalar() is not None
+        trigram_support[url] = supported
+    return trigram_support[url]
+
+
+def escape_like(term):
+    return (
+        term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+
+
+def search_by_name(model, term, page=1):
+    # case-insensitive partial match on `model.name`. On postgres the
+    # ILIKE '%term%' filter is answered from the trigram GIN index and the
+    # matches are ranked by similarity to the search term. Pages below 1
+    # show the first page.
+    page = max(page, 1)
+    condition = model.name.ilike('%' + escape_like(term) + '%', escape='\\')
+    query = db.session.query(
+        model.id,
+        model.name,
+        db.func.count().over().label('total')
+    ).filter(condition)
+    if has_trigram_support():
+        query = query.order_by(
+            db.func.similarity(model.name, term).desc(), model.id)
+    else:
+        query = query.order_by(model.name, model.id)
+
+    rows = query.limit(SEARCH_RESULTS_PER_PAGE).offset(
+        (page - 1) * SEARCH_RESULTS_PER_PAGE).all()
+    if rows:
+        count = rows[0].total
+    else:
+        count = db.session.query(db.func.count(model.id)).filter(
+            condition).scalar()
+
+    return {
+        'count': count,
+        'page': page,
+        'next_page': page + 1 if count > page * SEARCH_RESULTS_PER_PAGE else None,
+        'data': [{
+            'id': row.id,
+            'name': row.name,
+        } for row in rows]
+    }
+
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+AUTOCOMPLETE_LIMIT = 10
+
+# how long a worker serves its index before reloading it from the database,
+# which bounds how stale it gets when another worker handled a write
+SEARCH_INDEX_MAX_AGE = 300
+
+KINDS = ('venue', 'artist', 'show')
+
+
+def phrases(*fields):
+    # every word suffix of every field, so "mus" and "musical h" both prefix
+    # a key of "The Musical Hop"
+    keys = set()
+    for field in fields:
+        words = (field or '').lower().split()
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+    return keys
+
+
+# show fields that the index maps back to their show ids
+SHOW_OWNERS = ('venue_id', 'artist_id')
+
+
+class PrefixIndex:
+    """Sorted arrays of (phrase, id) per kind, answering prefix lookups with a
+    bisect and a short forward scan."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.keys = {kind: [] for kind in KINDS}
+            self.entries = {}
+            self.shows = {field: {} for field in SHOW_OWNERS}
+            self.built_at = None
+
+    def is_stale(self):
+        return (self.built_at is None or
+                time.monotonic() - self.built_at > SEARCH_INDEX_MAX_AGE)
+
+    def load(self, items):
+        keys = {kind: [] for kind in KINDS}
+        entries = {}
+        shows = {field: {} for field in SHOW_OWNERS}
+        for kind, entry, fields in items:
+            tokens = phrases(*fields)
+            entries[(kind, entry['id'])] = (entry, tokens)
+            keys[kind].extend((token, entry['id']) for token in tokens)
+            if kind == 'show':
+                for field in SHOW_OWNERS:
+                    shows[field].setdefault(entry[field], set()).add(entry['id'])
+        for kind in KINDS:
+            keys[kind].sort()
+        with self.lock:
+            self.keys = keys
+            self.entries = entries
+            self.shows = shows
+            self.built_at = time.monotonic()
+
+    def add(self, kind, entry, fields):
+        tokens = phrases(*fields)
+        with self.lock:
+            self._remove(kind, entry['id'])
+            self.entries[(kind, entry['id'])] = (entry, tokens)
+            for token in tokens:
+                insort(self.keys[kind], (token, entry['id']))
+            if kind == 'show':
+                for field in SHOW_OWNERS:
+                    self.shows[field].setdefault(
+                        entry[field], set()).add(entry['id'])
+
+    def remove(self, kind, id):
+        with self.lock:
+            self._remove(kind, id)
+
+    def remove_shows(self, field, ids):
+        # drops the shows of some venues or artists, e.g. `venue_id`, found
+        # through their show ids rather than a pass over the index
+        with self.lock:
+            for id in ids:
+                for show_id in list(self.shows[field].get(id, ())):
+                    self._remove('show', show_id)
+
+    def _remove(self, kind, id):
+        item = self.entries.pop((kind, id), None)
+        if item is None:
+            return
+        keys = self.keys[kind]
+        for token in item[1]:
+            i = bisect_left(keys, (token, id))
+            if i < len(keys) and keys[i] == (token, id):
+                del keys[i]
+        if kind == 'show':
+            for field in SHOW_OWNERS:
+                show_ids = self.shows[field].get(item[0][field])
+                if show_ids is not None:
+                    show_ids.discard(id)
+                    if not show_ids:
+                        del self.shows[field][item[0][field]]
+
+    def search(self, term, limit=AUTOCOMPLETE_LIMIT):
+        term = ' '.join(term.lower().split())
+        results = {kind: [] for kind in KINDS}
+        if not term:
+            return results
+        now = datetime.now()
+        with self.lock:
+            for kind in KINDS:
+                keys = self.keys[kind]
+                seen = set()
+                i = bisect_left(keys, (term,))
+                while i < len(keys) and len(results[kind]) < limit:
+                    token, id = keys[i]
+                    i += 1
+                    if not token.startswith(term):
+                        break
+                    if id in seen:
+                        continue
+                    seen.add(id)
+                    entry = self.entries[(kind, id)][0]
+                    if kind == 'show' and entry['start_time'] <= now:
+                        continue
+                    results[kind].append(entry)
+        return results
+
+
+search_index = PrefixIndex()
+
+
+def venue_item(venue):
+    return ('venue', {
+        'id': venue.id,
+        'name': venue.name,
+        'city': venue.city,
+        'state': venue.state,
+    }, [venue.name, venue.city, venue.state] + list(venue.genres or []))
+
+
+def artist_item(artist):
+    return ('artist', {
+        'id': artist.id,
+        'name': artist.name,
+        'city': artist.city,
+        'state': artist.state,
+    }, [artist.name, artist.city, artist.state] + list(artist.genres or []))
+
+
+def show_item(show):
+    return ('show', {
+        'id': show.id,
+        'venue_id': show.venue_id,
+        'venue_name': show.venue_name,
+        'artist_id': show.artist_id,
+        'artist_name': show.artist_name,
+        'start_time': show.start_time,
+    }, [show.venue_name, show.artist_name])
+
+
+def upcoming_shows_query():
+    return db.session.query(
+        Show.id,
+        Show.venue_id,
+        Show.artist_id,
+        Show.start_time,
+        Venue.name.label('venue_name'),
+        Artist.name.label('artist_name')
+    ).join(Venue, Venue.id == Show.venue_id).join(
+        Artist, Artist.id == Show.artist_id
+    ).filter(Show.start_time > datetime.now())
+
+
+def build_search_index():
+    items = [venue_item(venue) for venue in db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.genres)]
+    items.extend(artist_item(artist) for artist in db.session.query(
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.genres))
+    items.extend(show_item(show) for show in upcoming_shows_query())
+    search_index.load(items)
+
+
+def autocomplete(term):
+    if search_index.is_stale():
+        build_search_index()
+    return search_index.search(term)
+
+
+def index_venue(venue):
+    # call after a venue is created or edited; its shows carry its name.
+    # A stale index is rebuilt on the next lookup, so it is not worth updating
+    if search_index.is_stale():
+        return
+    search_index.add(*venue_item(venue))
+    reindex_shows('venue_id', venue.id)
+
+
+def index_artist(artist):
+    if search_index.is_stale():
+        return
+    search_index.add(*artist_item(artist))
+    reindex_shows('artist_id', artist.id)
+
+
+def index_show(show_id):
+    if search_index.is_stale():
+        return
+    for show in upcoming_shows_query().filter(Show.id == show_id):
+        search_index.add(*show_item(show))
+
+
+def reindex_shows(field, id):
+    search_index.remove_shows(field, {id})
+    for show in upcoming_shows_query().filter(getattr(Show, field) == id):
+        search_index.add(*show_item(show))
+
+
+def unindex_venue(*venue_ids):
+    if search_index.is_stale():
+        return
+    for venue_id in venue_ids:
+        search_index.remove('venue', venue_id)
+    search_index.remove_shows('venue_id', set(venue_ids))
+
+
+def unindex_artist(*artist_ids):
+    if search_index.is_stale():
+        return
+    for artist_id in artist_ids:
+        search_index.remove('artist', artist_id)
+    search_index.remove_shows('artist_id', set(artist_ids))
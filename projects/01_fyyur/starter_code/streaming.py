@@ -0,0 +1,61 @@
+import json
+from datetime import date
+from itertools import islice
+
+from flask import Response, request, stream_with_context
+
+#----------------------------------------------------------------------------#
+# Streaming JSON.
+#----------------------------------------------------------------------------#
+
+# rows fetched from the server-side cursor, and written out, at a time
+API_BATCH_SIZE = 1000
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+encoder = json.JSONEncoder(default=default, separators=(',', ':'))
+
+
+def wants_ndjson():
+    return (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best == NDJSON_MIMETYPE)
+
+
+def batches(query, size):
+    # the query's rows in lists of `size`, read through a server-side cursor
+    # so only one batch is held in memory
+    rows = iter(query.yield_per(size))
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_query(query, size=API_BATCH_SIZE):
+    # responds with the rows of a column query as a JSON array, or as one
+    # JSON object per line when NDJSON is asked for. The first rows are sent
+    # as soon as the first batch is fetched.
+    ndjson = wants_ndjson()
+
+    def generate():
+        separator = '[' if not ndjson else ''
+        for batch in batches(query, size):
+            encoded = [encoder.encode(row._asdict()) for row in batch]
+            if ndjson:
+                yield '\n'.join(encoded) + '\n'
+            else:
+                yield separator + ','.join(encoded)
+                separator = ','
+        if not ndjson:
+            yield '[]' if separator == '[' else ']'
+
+    return Response(stream_with_context(generate()),
+                    mimetype=NDJSON_MIMETYPE if ndjson else 'application/json')
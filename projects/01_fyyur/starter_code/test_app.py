@@ -0,0 +1,1046 @@
+import atexit
+import click
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+from functools import partial
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from app import app, create_app, db, format_datetime, Venue, Artist, Show
+from datagen import generate_shows, generate_venues
+from cache import MemoryCache, page_cache, page_key
+from counters import count_show, recount, rollover
+from database import TimedQueuePool, pool_metrics
+from replicas import replica_binds
+from streaming import stream_query
+from search import PrefixIndex, search_index
+from names import venue_names, artist_names
+from logs import JsonFormatter, SamplingFilter, listen, request_logger
+from logging.handlers import BufferingHandler
+from forms import VenueForm
+from werkzeug.datastructures import MultiDict
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.database_name = "fyyurapp_test"
+        self.database_path = "postgresql://{}:{}@{}/{}".format(
+            'brian', 'admin', 'localhost:5432', self.database_name
+            )
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.database_path
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client
+        search_index.clear()
+        page_cache.clear()
+        venue_names.clear()
+        artist_names.clear()
+
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            venue = Venue(
+                name='The Musical Hop',
+                genres=['Jazz', 'Folk'],
+                city='San Francisco',
+                state='CA',
+                address='1015 Folsom Street'
+            )
+            artist = Artist(
+                name='Guns N Petals',
+                genres=['Rock n Roll'],
+                city='San Francisco',
+                state='CA'
+            )
+            db.session.add_all([venue, artist])
+            db.session.commit()
+            self.venue_id = venue.id
+            self.artist_id = artist.id
+
+    def tearDown(self):
+        """Executed after reach test"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    @contextmanager
+    def assert_num_queries(self, expected):
+        """Fails if the block runs a different number of SQL statements"""
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        self.assertEqual(len(statements), expected, '\n\n'.join(statements))
+
+    def add_shows(self, count, days):
+        """Books `count` shows, each with its own venue, `days` from now"""
+        with app.app_context():
+            for i in range(count):
+                venue = Venue(
+                    name='Venue {}'.format(i),
+                    genres=['Jazz'],
+                    city='New York',
+                    state='NY'
+                )
+                db.session.add(venue)
+                db.session.flush()
+                show = Show(
+                    venue_id=venue.id,
+                    artist_id=self.artist_id,
+                    start_time=datetime.now() + timedelta(days=days)
+                )
+                db.session.add(show)
+                count_show(show)
+            db.session.commit()
+
+    def test_get_venues(self):
+        self.add_shows(2, 7)
+        res = self.client().get('/venues')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'San Francisco, CA', res.data)
+        self.assertIn(b'New York, NY', res.data)
+
+    def test_filter_venues_by_genre(self):
+        self.add_shows(2, 7)
+        with self.assert_num_queries(2):
+            res = self.client().get('/venues?genre=Jazz&genre=Folk')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertNotIn(b'Venue 0', res.data)
+        self.assertIn(b'Folk (1)', res.data)
+
+        res = self.client().get('/venues?genre=Jazz&genre=Folk&match=any')
+
+        self.assertIn(b'Venue 0', res.data)
+        self.assertIn(b'Jazz (3)', res.data)
+
+    def test_create_show_counts_upcoming_show(self):
+        res = self.client().post('/shows/create', data={
+            'venue_id': self.venue_id,
+            'artist_id': self.artist_id,
+            'start_time': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+        self.assertIn(b'Show was successfully listed!', res.data)
+        with app.app_context():
+            venue = Venue.query.get(self.venue_id)
+            artist = Artist.query.get(self.artist_id)
+            self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (1, 0))
+            self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (1, 0))
+
+        res = self.client().get('/venues')
+
+        self.assertIn(b'1 upcoming shows', res.data)
+
+    def test_rollover_moves_started_shows(self):
+        self.add_shows(2, 1)
+        with app.app_context():
+            venue_ids, artist_ids = rollover(datetime.now() + timedelta(days=2))
+            artist = Artist.query.get(self.artist_id)
+
+            self.assertEqual(len(venue_ids), 2)
+            self.assertEqual(artist_ids, [self.artist_id])
+            self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (0, 2))
+            self.assertEqual(rollover(datetime.now() + timedelta(days=2)), ([], []))
+
+    def test_rollover_command(self):
+        self.add_shows(1, -1)
+        with app.app_context():
+            db.session.query(Show).update({Show.is_past: False})
+            db.session.query(Artist).update({
+                Artist.upcoming_shows_count: 1, Artist.past_shows_count: 0})
+            db.session.commit()
+        result = app.test_cli_runner().invoke(args=['fyyur', 'rollover'])
+
+        self.assertIn('Rolled over shows of 1 venues and 1 artists', result.output)
+        with app.app_context():
+            artist = Artist.query.get(self.artist_id)
+            self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (0, 1))
+
+    def test_rollover_command_clears_only_shared_pages(self):
+        class SharedCache(MemoryCache):
+            shared = True
+
+        key = page_key('artist', self.artist_id)
+        for backend, expected in ((MemoryCache(), 'page'), (SharedCache(), None)):
+            self.add_shows(1, -1)
+            with app.app_context():
+                db.session.query(Show).update({Show.is_past: False})
+                db.session.commit()
+            with patch.object(page_cache, 'backend', backend):
+                page_cache.set(key, 'page')
+                app.test_cli_runner().invoke(args=['fyyur', 'rollover'])
+
+                self.assertEqual(backend.get(key), expected)
+
+    def test_delete_artist_uncounts_venue_shows(self):
+        self.add_shows(1, 7)
+        self.client().delete('/artists/{}'.format(self.artist_id))
+
+        with app.app_context():
+            venue = Venue.query.filter_by(name='Venue 0').one()
+            self.assertEqual(venue.upcoming_shows_count, 0)
+
+    def test_recount_repairs_counters(self):
+        self.add_shows(2, 7)
+        with app.app_context():
+            db.session.query(Venue).update({Venue.upcoming_shows_count: 5})
+            db.session.commit()
+            recount()
+
+            self.assertEqual(sorted(
+                count for count, in db.session.query(Venue.upcoming_shows_count)
+            ), [0, 1, 1])
+
+    def test_sort_artists_by_upcoming_shows(self):
+        with app.app_context():
+            artist = Artist(name='Zebra Stripes', genres=['Jazz'])
+            db.session.add(artist)
+            db.session.flush()
+            show = Show(venue_id=self.venue_id, artist_id=artist.id,
+                        start_time=datetime.now() + timedelta(days=7))
+            db.session.add(show)
+            count_show(show)
+            db.session.commit()
+        with self.assert_num_queries(2):
+            res = self.client().get('/artists?sort=popular')
+
+        self.assertLess(res.data.index(b'Zebra Stripes'), res.data.index(b'Guns N Petals'))
+
+        res = self.client().get('/artists')
+
+        self.assertLess(res.data.index(b'Guns N Petals'), res.data.index(b'Zebra Stripes'))
+
+    def test_filter_artists_by_genre(self):
+        res = self.client().get('/artists?genre=Jazz')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn(b'Guns N Petals', res.data)
+
+        res = self.client().get('/artists')
+
+        self.assertIn(b'Guns N Petals', res.data)
+        self.assertIn(b'Rock n Roll (1)', res.data)
+
+    def test_show_venue(self):
+        with app.app_context():
+            db.session.add(Show(
+                venue_id=self.venue_id,
+                artist_id=self.artist_id,
+                start_time=datetime.now() + timedelta(days=7)
+            ))
+            db.session.commit()
+        res = self.client().get('/venues/' + str(self.venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'1 Upcoming Show', res.data)
+        self.assertIn(b'0 Past Shows', res.data)
+        self.assertIn(b'Guns N Petals', res.data)
+
+    def test_show_artist_runs_one_query(self):
+        self.add_shows(10, -7)
+        self.add_shows(10, 7)
+        with self.assert_num_queries(1):
+            res = self.client().get('/artists/' + str(self.artist_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'10 Upcoming Shows', res.data)
+        self.assertIn(b'10 Past Shows', res.data)
+
+    def test_show_venue_runs_one_query(self):
+        with app.app_context():
+            for days in range(-5, 5):
+                db.session.add(Show(
+                    venue_id=self.venue_id,
+                    artist_id=self.artist_id,
+                    start_time=datetime.now() + timedelta(days=days, hours=1)
+                ))
+            db.session.commit()
+        with self.assert_num_queries(1):
+            res = self.client().get('/venues/' + str(self.venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'5 Upcoming Shows', res.data)
+        self.assertIn(b'5 Past Shows', res.data)
+
+    def test_get_shows_paginated(self):
+        self.add_shows(35, 7)
+        with self.assert_num_queries(1):
+            res = self.client().get('/shows')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'playing at'), 30)
+        self.assertIn(b'/shows?after=', res.data)
+
+        cursor = res.data.split(b'/shows?after=')[1].split(b'"')[0]
+        res = self.client().get('/shows?after=' + cursor.decode())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'playing at'), 5)
+        self.assertNotIn(b'/shows?after=', res.data)
+
+    def test_400_if_bad_shows_cursor(self):
+        res = self.client().get('/shows?after=yesterday')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_search_venues(self):
+        res = self.client().post('/venues/search', data={'search_term': 'hOp'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'search results for "hOp": 1', res.data)
+        self.assertIn(b'The Musical Hop', res.data)
+
+    def test_search_artists_paginated(self):
+        with app.app_context():
+            for i in range(25):
+                db.session.add(Artist(name='Band {}'.format(i), genres=['Jazz']))
+            db.session.commit()
+        res = self.client().post('/artists/search', data={'search_term': 'band'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'search results for "band": 25', res.data)
+        self.assertIn(b'/artists/search?page=2', res.data)
+
+        res = self.client().post(
+            '/artists/search?page=2', data={'search_term': 'band'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'fa-users'), 5)
+
+    def test_search_page_below_one_shows_first_page(self):
+        for url in ('/venues/search', '/artists/search'):
+            for page in (0, -1):
+                res = self.client().post('{}?page={}'.format(url, page),
+                                         data={'search_term': 'a'})
+
+                self.assertEqual(res.status_code, 200)
+                self.assertIn(b'search results for "a": 1', res.data)
+
+    def test_search_escapes_wildcards(self):
+        res = self.client().post('/venues/search', data={'search_term': '%'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'search results for "%": 0', res.data)
+
+    def test_autocomplete(self):
+        self.add_shows(1, 7)
+        res = self.client().get('/search?term=guns')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['artists'][0]['name'], 'Guns N Petals')
+        self.assertEqual(len(data['shows']), 1)
+        self.assertEqual(data['venues'], [])
+
+        res = self.client().get('/search?term=San Fran')
+        data = json.loads(res.data)
+
+        self.assertEqual(data['venues'][0]['name'], 'The Musical Hop')
+        self.assertEqual(data['artists'][0]['name'], 'Guns N Petals')
+
+    def test_autocomplete_without_queries(self):
+        self.client().get('/search?term=jazz')
+        with self.assert_num_queries(0):
+            res = self.client().get('/search?term=folk')
+        data = json.loads(res.data)
+
+        self.assertEqual(data['venues'][0]['name'], 'The Musical Hop')
+
+    def test_autocomplete_follows_writes(self):
+        self.client().get('/search?term=wild')
+        self.client().post('/artists/create', data={
+            'name': 'The Wild Sax Band',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'genres': ['Jazz', 'Classical'],
+        })
+        res = self.client().get('/search?term=wild sax')
+        data = json.loads(res.data)
+
+        self.assertEqual(len(data['artists']), 1)
+
+        self.client().delete('/artists/' + str(data['artists'][0]['id']))
+        res = self.client().get('/search?term=wild')
+        data = json.loads(res.data)
+
+        self.assertEqual(data['artists'], [])
+
+    def test_remove_shows_only_touches_their_shows(self):
+        index = PrefixIndex()
+        start_time = datetime.now() + timedelta(days=1)
+        index.load([('show', {
+            'id': show_id,
+            'venue_id': venue_id,
+            'venue_name': 'The Musical Hop',
+            'artist_id': 1,
+            'artist_name': 'Guns N Petals',
+            'start_time': start_time,
+        }, ['The Musical Hop', 'Guns N Petals'])
+            for show_id, venue_id in [(1, 1), (2, 2), (3, 2)]])
+
+        with patch.object(index, '_remove', wraps=index._remove) as remove:
+            index.remove_shows('venue_id', {1})
+
+        remove.assert_called_once_with('show', 1)
+        self.assertEqual([show['id'] for show in index.search('guns')['show']],
+                         [2, 3])
+        self.assertEqual(index.shows['artist_id'], {1: {2, 3}})
+
+    def test_import_command(self):
+        rows = [{
+            'name': 'The Dueling Pianos Bar',
+            'genres': ['Classical', 'R&B'],
+            'address': '335 Delancey Street',
+            'city': 'New York',
+            'state': 'NY',
+            'website': 'https://www.theduelingpianos.com',
+            'facebook_link': 'https://www.facebook.com/theduelingpianos',
+            'seeking_talent': False,
+        }, {
+            'name': 'Nowhere',
+            'genres': ['Not a genre'],
+        }] * 3
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'venues.jsonl')
+            with open(path, 'w') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+            result = app.test_cli_runner().invoke(args=[
+                'fyyur', 'import', path, '--kind', 'venue',
+                '--offset', '2', '--batch-size', '1'
+            ])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 2 venue rows', result.output)
+        self.assertIn('2 rejected', result.output)
+        self.assertIn('resume with --offset 5', result.output)
+        with app.app_context():
+            self.assertEqual(Venue.query.filter_by(state='NY').count(), 2)
+
+    def test_import_shows_counts_each_batch(self):
+        with app.app_context():
+            # drift that a full recount would repair
+            db.session.query(Artist).update({Artist.upcoming_shows_count: 10})
+            db.session.commit()
+        rows = [{
+            'venue_id': self.venue_id,
+            'artist_id': self.artist_id,
+            'start_time': start_time,
+        } for start_time in ('2019-05-21 21:30:00', '2035-04-01 20:00:00',
+                             '2035-04-08 20:00:00')]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shows.jsonl')
+            with open(path, 'w') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+            result = app.test_cli_runner().invoke(args=[
+                'fyyur', 'import', path, '--kind', 'show', '--batch-size', '2'
+            ])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        with app.app_context():
+            venue = Venue.query.get(self.venue_id)
+            artist = Artist.query.get(self.artist_id)
+            self.assertEqual(
+                (venue.upcoming_shows_count, venue.past_shows_count), (2, 1))
+            self.assertEqual(
+                (artist.upcoming_shows_count, artist.past_shows_count), (12, 1))
+            self.assertEqual(sorted(
+                is_past for is_past, in db.session.query(Show.is_past)
+            ), [False, False, True])
+
+    def test_generate_command(self):
+        result = app.test_cli_runner().invoke(args=[
+            'fyyur', 'generate', '--replace',
+            '--venues', '20', '--artists', '10', '--shows', '100'
+        ])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        with app.app_context():
+            self.assertEqual(Venue.query.count(), 20)
+            self.assertEqual(Show.query.count(), 100)
+            self.assertEqual(db.session.query(db.func.sum(
+                Venue.upcoming_shows_count + Venue.past_shows_count)).scalar(), 100)
+
+    def test_generated_data_is_deterministic(self):
+        self.assertEqual(list(generate_venues(50, seed=1)),
+                         list(generate_venues(50, seed=1)))
+        self.assertNotEqual(list(generate_venues(50, seed=1)),
+                            list(generate_venues(50, seed=2)))
+        start = datetime(2030, 1, 1)
+        self.assertEqual(list(generate_shows(50, 5, 5, seed=1, start=start)),
+                         list(generate_shows(50, 5, 5, seed=1, start=start)))
+
+    def test_show_venue_served_from_cache(self):
+        self.client().get('/venues/' + str(self.venue_id))
+        with self.assert_num_queries(0):
+            res = self.client().get('/venues/' + str(self.venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(page_cache.stats()['hits'], 1)
+        self.assertEqual(page_cache.stats()['misses'], 1)
+
+    def test_show_form_posts_to_another_worker(self):
+        import importlib
+        import re
+        import config
+        self.addCleanup(importlib.reload, config)
+
+        def start_worker():
+            # each worker process imports its own config
+            with patch.dict(os.environ, {'FYYUR_SECRET_KEY': 'shared key'}):
+                importlib.reload(config)
+            worker = create_app()
+            worker.config['SQLALCHEMY_DATABASE_URI'] = self.database_path
+            return worker
+
+        renderer, receiver = start_worker(), start_worker()
+
+        res = renderer.test_client().get('/shows/create')
+        token = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"',
+                          res.data).group(1).decode('utf-8')
+        cookie = res.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+        client = receiver.test_client()
+        client.set_cookie('localhost', 'session', cookie)
+        res = client.post('/shows/create', data={
+            'csrf_token': token,
+            'venue_id': self.venue_id,
+            'artist_id': self.artist_id,
+            'start_time': '2035-04-01 20:00:00',
+        })
+
+        self.assertIn(b'Show was successfully listed!', res.data)
+
+    def test_create_show_invalidates_cached_pages(self):
+        self.client().get('/venues/' + str(self.venue_id))
+        self.client().get('/artists/' + str(self.artist_id))
+        self.client().post('/shows/create', data={
+            'venue_id': self.venue_id,
+            'artist_id': self.artist_id,
+            'start_time': '2035-04-01 20:00:00',
+        })
+        res = self.client().get('/venues/' + str(self.venue_id))
+
+        self.assertIn(b'1 Upcoming Show', res.data)
+
+        res = self.client().get('/artists/' + str(self.artist_id))
+
+        self.assertIn(b'1 Upcoming Show', res.data)
+        self.assertEqual(page_cache.stats()['hits'], 0)
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        cache = MemoryCache(max_entries=2, ttl=300)
+        cache.set('venue:1', 'one')
+        cache.set('venue:2', 'two')
+        cache.get('venue:1')
+        cache.set('venue:3', 'three')
+
+        self.assertEqual(cache.get('venue:1'), 'one')
+        self.assertIsNone(cache.get('venue:2'))
+
+        cache = MemoryCache(ttl=-1)
+        cache.set('venue:1', 'one')
+
+        self.assertIsNone(cache.get('venue:1'))
+
+    def test_api_venues_streams_json_array(self):
+        self.add_shows(3, 7)
+        res = self.client().get('/api/v1/venues')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/json')
+        self.assertEqual([venue['name'] for venue in data],
+                         ['The Musical Hop', 'Venue 0', 'Venue 1', 'Venue 2'])
+        self.assertEqual(data[1]['upcoming_shows_count'], 1)
+
+    def test_api_shows_streams_ndjson_in_batches(self):
+        self.add_shows(5, 7)
+        with patch('app.stream_query', partial(stream_query, size=2)):
+            res = self.client().get('/api/v1/shows?format=ndjson')
+            chunks = list(res.iter_encoded())
+        lines = b''.join(chunks).decode().splitlines()
+
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['artist_name'], 'Guns N Petals')
+        datetime.fromisoformat(json.loads(lines[0])['start_time'])
+
+    def test_api_empty_listing(self):
+        res = self.client().get('/api/v1/artists?genre=Jazz')
+
+        self.assertEqual(json.loads(res.data), [])
+
+    def book_show(self, days, hours=0, venue_id=None, artist_id=None):
+        return self.client().post('/shows/create', data={
+            'venue_id': venue_id or self.venue_id,
+            'artist_id': artist_id or self.artist_id,
+            'start_time': (datetime(2035, 4, 6, 20) + timedelta(days=days, hours=hours)
+                           ).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+    def test_create_show_rejects_double_booking(self):
+        self.book_show(0)
+        with app.app_context():
+            artist = Artist(name='Matt Quevedo', genres=['Jazz'])
+            db.session.add(artist)
+            db.session.commit()
+            other_artist_id = artist.id
+        res = self.book_show(0, hours=2, artist_id=other_artist_id)
+
+        self.assertIn(b'The venue or artist is already booked', res.data)
+
+        res = self.book_show(0, hours=3, artist_id=other_artist_id)
+
+        self.assertIn(b'Show was successfully listed!', res.data)
+        with app.app_context():
+            self.assertEqual(Show.query.count(), 2)
+
+    def test_get_venue_availability(self):
+        self.book_show(0)
+        with app.app_context():
+            db.session.add(Venue(name='Park Square Live Music & Coffee',
+                                 genres=['Jazz'], city='San Francisco', state='CA'))
+            db.session.commit()
+        res = self.client().get('/api/v1/venues/availability', query_string={
+            'city': 'San Francisco', 'state': 'CA',
+            'start': '2035-04-06T18:00', 'end': '2035-04-06T21:00'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([venue['name'] for venue in data['free']],
+                         ['Park Square Live Music & Coffee'])
+        self.assertEqual(data['busy'][0]['name'], 'The Musical Hop')
+        self.assertEqual(data['busy'][0]['shows'][0]['end_time'], '2035-04-06T23:00:00')
+
+        res = self.client().get('/api/v1/venues/availability', query_string={
+            'city': 'San Francisco', 'state': 'CA',
+            'start': '2035-04-06T23:00', 'end': '2035-04-07T02:00'})
+
+        self.assertEqual(len(json.loads(res.data)['free']), 2)
+
+    def test_400_if_availability_range_is_invalid(self):
+        res = self.client().get('/api/v1/venues/availability', query_string={
+            'city': 'San Francisco', 'state': 'CA',
+            'start': '2035-04-06T18:00', 'end': '2035-06-06T18:00'})
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_delete_venue_cascades_to_shows_in_database(self):
+        self.add_shows(3, 7)
+        with app.app_context():
+            venue_id = Venue.query.filter_by(name='Venue 0').one().id
+        with self.assert_num_queries(4) as statements:
+            res = self.client().delete('/venues/{}'.format(venue_id))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(any(statement.startswith('DELETE FROM show')
+                             for statement in statements))
+        with app.app_context():
+            self.assertEqual(Show.query.count(), 2)
+            self.assertEqual(Artist.query.get(self.artist_id).upcoming_shows_count, 2)
+
+    def test_delete_artist_runs_constant_queries(self):
+        self.add_shows(20, 7)
+        with self.assert_num_queries(4):
+            self.client().delete('/artists/{}'.format(self.artist_id))
+
+        with app.app_context():
+            self.assertEqual(Show.query.count(), 0)
+
+    def test_batch_delete_venues(self):
+        self.add_shows(3, 7)
+        with app.app_context():
+            venue_ids = [id for id, in db.session.query(Venue.id)]
+        res = self.client().delete('/venues', json={'ids': venue_ids[:3] + [0]})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], 3)
+        with app.app_context():
+            self.assertEqual(Venue.query.count(), 1)
+            self.assertEqual(Show.query.count(), 1)
+
+    def test_400_if_batch_delete_ids_are_invalid(self):
+        res = self.client().delete('/artists', json={'ids': ['1']})
+
+        self.assertEqual(res.status_code, 400)
+
+    def venue_form(self, **changes):
+        form = {
+            'name': 'The Musical Hop',
+            'genres': ['Jazz', 'Folk'],
+            'address': '1015 Folsom Street',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'version': '1',
+        }
+        form.update(changes)
+        return form
+
+    def test_edit_venue_form_is_filled_from_venue(self):
+        res = self.client().get('/venues/{}/edit'.format(self.venue_id))
+
+        self.assertIn(b'value="1015 Folsom Street"', res.data)
+        self.assertIn(b'name="version" type="hidden" value="1"', res.data)
+
+    def test_edit_venue_updates_only_changed_columns(self):
+        with self.assert_num_queries(3) as statements:
+            res = self.client().post('/venues/{}/edit'.format(self.venue_id),
+                                     data=self.venue_form(city='Oakland'))
+
+        self.assertEqual(res.status_code, 302)
+        update = [statement for statement in statements if statement.startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('SET city=', update[0])
+        self.assertNotIn('name=', update[0])
+        self.assertIn('WHERE venue.id = %(venue_id)s AND venue.version = %(venue_version)s', update[0])
+        with app.app_context():
+            venue = Venue.query.get(self.venue_id)
+            self.assertEqual((venue.city, venue.name, venue.version),
+                             ('Oakland', 'The Musical Hop', 2))
+
+    def test_edit_venue_without_changes_writes_nothing(self):
+        with self.assert_num_queries(1):
+            self.client().post('/venues/{}/edit'.format(self.venue_id),
+                               data=self.venue_form())
+
+    def test_edit_venue_from_stale_form_is_refused(self):
+        self.client().post('/venues/{}/edit'.format(self.venue_id),
+                           data=self.venue_form(city='Oakland'))
+        res = self.client().post('/venues/{}/edit'.format(self.venue_id),
+                                 data=self.venue_form(name='The Musical Hip'),
+                                 follow_redirects=True)
+
+        self.assertIn(b'was changed by someone else', res.data)
+        with app.app_context():
+            venue = Venue.query.get(self.venue_id)
+            self.assertEqual((venue.name, venue.version), ('The Musical Hop', 2))
+
+    def test_edit_artist_stores_plain_values(self):
+        self.client().post('/artists/{}/edit'.format(self.artist_id), data={
+            'name': 'Guns N Roses',
+            'genres': ['Rock n Roll'],
+            'city': 'San Francisco',
+            'state': 'CA',
+            'version': '1',
+        })
+
+        with app.app_context():
+            artist = Artist.query.get(self.artist_id)
+            self.assertEqual(artist.name, 'Guns N Roses')
+            self.assertEqual(artist.genres, ['Rock n Roll'])
+
+    def test_new_show_form_picks_from_names(self):
+        res = self.client().get('/shows/create')
+
+        self.assertIn('<option value="{}">Guns N Petals</option>'.format(
+            self.artist_id).encode(), res.data)
+        self.assertIn('<option value="{}">The Musical Hop</option>'.format(
+            self.venue_id).encode(), res.data)
+
+    def test_create_show_rejects_unknown_venue(self):
+        res = self.book_show(0, venue_id=self.venue_id + 100)
+
+        self.assertIn(b'Show could not be listed', res.data)
+        with app.app_context():
+            self.assertEqual(Show.query.count(), 0)
+
+    def test_names_follow_writes(self):
+        self.client().get('/shows/create')
+        self.client().post('/venues/create', data={
+            'name': 'Park Square Live Music & Coffee',
+            'genres': ['Jazz'],
+            'address': '34 Whiskey Moore Ave',
+            'city': 'San Francisco',
+            'state': 'CA',
+        })
+
+        self.assertIn('Park Square Live Music & Coffee', venue_names.names.values())
+
+        self.client().delete('/venues/{}'.format(self.venue_id))
+
+        self.assertNotIn(self.venue_id, venue_names.names)
+
+    def test_form_choices_are_shared_and_validated(self):
+        with app.test_request_context():
+            form = VenueForm(formdata=MultiDict([
+                ('name', 'The Musical Hop'), ('city', 'San Francisco'),
+                ('state', 'XX'), ('address', '1015 Folsom Street'),
+                ('genres', 'Jazz'), ('genres', 'Polka'),
+            ]), meta={'csrf': False})
+
+            self.assertFalse(form.validate())
+            self.assertIn('state', form.errors)
+            self.assertEqual(form.errors['genres'],
+                             ["'Polka' is not a valid choice for this field"])
+            self.assertIs(form.state.choices, VenueForm(meta={'csrf': False}).state.choices)
+
+    def capture_logs(self, *filters):
+        """Sends the request log through the queue to a buffer, as
+        init_logging does with the log file outside debug mode"""
+        buffer = BufferingHandler(100)
+        buffer.setFormatter(JsonFormatter())
+        listener = listen([request_logger], buffer, filters=filters)
+        self.addCleanup(request_logger.handlers.clear)
+        return listener, buffer
+
+    def test_request_log_has_timings(self):
+        listener, buffer = self.capture_logs()
+        res = self.client().get('/venues/{}'.format(self.venue_id),
+                                headers={'X-Request-ID': 'abc123'})
+        listener.stop()
+        entry = json.loads(buffer.format(buffer.buffer[0]))
+
+        self.assertEqual(res.headers['X-Request-ID'], 'abc123')
+        self.assertEqual(entry['request_id'], 'abc123')
+        self.assertEqual(entry['route'], '/venues/<int:venue_id>')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['db_queries'], 1)
+        self.assertGreater(entry['render_ms'], 0)
+        self.assertGreaterEqual(entry['duration_ms'], entry['db_ms'] + entry['render_ms'])
+
+    def test_request_log_is_sampled(self):
+        listener, buffer = self.capture_logs(SamplingFilter(0))
+        res = self.client().get('/venues')
+        request_logger.warning('slow request')
+        listener.stop()
+
+        self.assertEqual(len(res.headers['X-Request-ID']), 32)
+        self.assertEqual([record.getMessage() for record in buffer.buffer],
+                         ['slow request'])
+
+    def test_failed_query_leaves_no_start_time(self):
+        with app.app_context():
+            with db.engine.connect() as conn:
+                with self.assertRaises(DBAPIError):
+                    conn.execute(db.text('SELECT 1 / 0'))
+                conn.execute(db.text('SELECT 1'))
+
+                self.assertEqual(conn.info['query_started'], [])
+
+    def test_log_file_attached_once(self):
+        import config
+        import logs
+        settings = {key: getattr(config, key) for key in dir(config)
+                    if key.isupper()}
+        log_dir = tempfile.mkdtemp()
+        settings.update(DEBUG=False,
+                        LOG_FILE=os.path.join(log_dir, 'fyyur.log'))
+        handlers = list(request_logger.handlers)
+
+        with patch('logs.file_listener', None):
+            first = create_app(type('Config', (), settings))
+            create_app(type('Config', (), settings))
+            atexit.unregister(logs.file_listener.stop)
+            logs.file_listener.stop()
+        added = [handler for handler in request_logger.handlers
+                 if handler not in handlers]
+        for handler in added:
+            request_logger.removeHandler(handler)
+            first.logger.removeHandler(handler)
+
+        self.assertEqual(len(added), 1)
+
+    def test_get_cache_stats(self):
+        res = self.client().get('/cache/stats')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['hit_rate'], 0.0)
+
+    def test_get_pool_stats(self):
+        pool_metrics.reset()
+        self.client().get('/venues/{}'.format(self.venue_id))
+        res = self.client().get('/pool/stats')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertGreaterEqual(data['checkouts'], 1)
+        self.assertEqual(data['timeouts'], 0)
+        self.assertEqual(data['checked_out'], 0)
+
+    def test_engine_uses_configured_pool(self):
+        with app.app_context():
+            pool = db.engine.pool
+            timeout = db.session.execute(
+                "SELECT setting FROM pg_settings WHERE name = 'statement_timeout'"
+            ).scalar()
+
+        self.assertIsInstance(pool, TimedQueuePool)
+        self.assertEqual(pool.size(), app.config['DB_POOL_SIZE'])
+        self.assertEqual(int(timeout), app.config['DB_STATEMENT_TIMEOUT'])
+
+    def test_flask_command_has_no_statement_timeout(self):
+        with click.Context(click.Command('fyyur')):
+            cli_app = create_app()
+        cli_app.config['SQLALCHEMY_DATABASE_URI'] = self.database_path
+
+        with cli_app.app_context():
+            timeout = db.session.execute(
+                "SELECT setting FROM pg_settings WHERE name = 'statement_timeout'"
+            ).scalar()
+
+        self.assertEqual(int(timeout), 0)
+
+    def use_replica(self):
+        """Points reads at fyyurapp_test_replica, holding one venue that
+        the primary does not have"""
+        app.config['SQLALCHEMY_REPLICA_URIS'] = [self.database_path + '_replica']
+        self.addCleanup(app.config.__setitem__, 'SQLALCHEMY_REPLICA_URIS', [])
+        with app.app_context():
+            replica_binds(app)
+            engine = db.get_engine(app, bind='replica_0')
+            db.Model.metadata.drop_all(engine)
+            db.Model.metadata.create_all(engine)
+            self.addCleanup(db.Model.metadata.drop_all, engine)
+            engine.execute(Venue.__table__.insert(), {
+                'name': 'The Replica Room',
+                'city': 'San Francisco',
+                'state': 'CA',
+                'address': '1 Lag Street',
+                'genres': ['Jazz'],
+            })
+
+    def test_reads_go_to_replica(self):
+        self.use_replica()
+        res = self.client().get('/venues')
+
+        self.assertIn(b'The Replica Room', res.data)
+        self.assertNotIn(b'The Musical Hop', res.data)
+
+        res = self.client().post('/venues/search', data={'search_term': 'room'})
+
+        self.assertIn(b'The Replica Room', res.data)
+
+    def test_reads_follow_own_writes(self):
+        self.use_replica()
+        client = self.client()
+        client.post('/venues/create', data={
+            'name': 'The Dueling Pianos Bar',
+            'city': 'New York',
+            'state': 'NY',
+            'address': '335 Delancey Street',
+            'genres': ['Jazz'],
+        })
+        res = client.get('/venues')
+
+        self.assertIn(b'The Dueling Pianos Bar', res.data)
+        self.assertNotIn(b'The Replica Room', res.data)
+
+        res = self.client().get('/venues')
+
+        self.assertIn(b'The Replica Room', res.data)
+
+    def test_secret_key_comes_from_environment(self):
+        import importlib
+        import config
+        self.addCleanup(importlib.reload, config)
+        with patch.dict(os.environ, {'FYYUR_SECRET_KEY': 'shared key'}):
+            importlib.reload(config)
+        workers = [create_app(), create_app()]
+
+        self.assertEqual([worker.secret_key for worker in workers],
+                         ['shared key', 'shared key'])
+
+    def test_create_app_builds_a_separate_app(self):
+        other = create_app()
+        other.config['SQLALCHEMY_DATABASE_URI'] = self.database_path
+        res = other.test_client().get('/venues/{}'.format(self.venue_id))
+
+        self.assertIsNot(other, app)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertNotIn('migrate', other.extensions)
+
+    def test_import_leaves_out_heavy_modules(self):
+        output = subprocess.run(
+            [sys.executable, '-c', 'import sys, app; print(sorted(sys.modules))'],
+            check=True, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.decode('utf-8')
+
+        self.assertNotIn("'alembic'", output)
+        self.assertNotIn("'flask_migrate'", output)
+        self.assertNotIn("'dateutil.parser'", output)
+
+    def test_datetime_filter_matches_babel(self):
+        import babel.dates
+        import dateutil.parser
+        patterns = {
+            'full': "EEEE MMMM, d, y 'at' h:mma",
+            'medium': "EE MM, dd, y h:mma",
+        }
+        value = datetime(2019, 5, 1, 9, 5)
+        string = '2019-05-01T09:05:00.000Z'
+
+        for format, pattern in patterns.items():
+            self.assertEqual(format_datetime(value, format),
+                             babel.dates.format_datetime(value, pattern))
+            self.assertEqual(format_datetime(string, format),
+                             babel.dates.format_datetime(
+                                 dateutil.parser.parse(string), pattern))
+        self.assertEqual(format_datetime(value, 'full'),
+                         'Wednesday May, 1, 2019 at 9:05AM')
+        self.assertEqual(format_datetime(value, 'yyyy-MM-dd HH:mm'),
+                         '2019-05-01 09:05')
+        self.assertEqual(format_datetime(value, 'short'),
+                         babel.dates.format_datetime(value, 'short'))
+
+    def test_show_split_uses_app_clock(self):
+        with app.app_context():
+            engine = db.engine
+            show = Show(venue_id=self.venue_id, artist_id=self.artist_id,
+                        start_time=datetime.now() + timedelta(hours=3))
+            db.session.add(show)
+            count_show(show)
+            db.session.commit()
+
+        def far_east(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET TIME ZONE 'Asia/Tokyo'")
+            cursor.close()
+
+        event.listen(engine, 'connect', far_east)
+        engine.dispose()
+        self.addCleanup(engine.dispose)
+        self.addCleanup(event.remove, engine, 'connect', far_east)
+        venue_page = self.client().get('/venues/{}'.format(self.venue_id))
+        artist_page = self.client().get('/artists/{}'.format(self.artist_id))
+
+        self.assertIn(b'1 Upcoming Show', venue_page.data)
+        self.assertIn(b'1 Upcoming Show', artist_page.data)
+
+    def test_404_if_venue_does_not_exist(self):
+        res = self.client().get('/venues/1001')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_404_if_artist_does_not_exist(self):
+        res = self.client().get('/artists/1001')
+
+        self.assertEqual(res.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,27 +1,139 @@
+import hashlib
+import json
 import os
+import threading
+import time
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category
+from .quiz import quiz_engine
+from .sessions import is_correct, quiz_sessions, init_quiz_sessions
 
 QUESTIONS_PER_PAGE = 10
 
+# seconds a cached question count is trusted; writes made by this process
+# clear the cache straight away, writes made by other processes show up
+# after at most this long
+COUNT_MAX_AGE = 60
 
-def paginated_questions(request, questions_list):
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
 
-    formatted_questions = [question.format() for question in questions_list]
-    paginated_questions = formatted_questions[start:end]
-    return paginated_questions
+class CountCache:
+    """Question counts by key, so the total of a listing is not counted on
+    every page."""
+
+    def __init__(self, max_age=COUNT_MAX_AGE):
+        self.max_age = max_age
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, query):
+        now = time.monotonic()
+        with self.lock:
+            cached = self.counts.get(key)
+        if cached is not None and now - cached[1] < self.max_age:
+            return cached[0]
+        count = query.count()
+        with self.lock:
+            self.counts[key] = (count, now)
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+
+
+question_counts = CountCache()
+
+# seconds the category registry is trusted before it is read again, so that
+# categories edited in the database show up without a restart
+CATEGORY_MAX_AGE = 300
+
+
+class CategoryRegistry:
+    """The {id: type} map of every category, read once and served from
+    memory. `version` is a hash of the map, so it is the same in every
+    process and changes only when the categories do."""
+
+    def __init__(self, max_age=CATEGORY_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.categories = {}
+        self.version = None
+        self.loaded_at = None
+
+    def invalidate(self):
+        # call after changing categories
+        with self.lock:
+            self.loaded_at = None
+
+    def load(self):
+        categories = dict(
+          db.session.query(Category.id, Category.type).order_by(Category.id)
+          )
+        version = hashlib.sha1(
+          json.dumps(list(categories.items())).encode('utf-8')
+          ).hexdigest()
+        with self.lock:
+            self.categories = categories
+            self.version = version
+            self.loaded_at = time.monotonic()
+
+    def get(self):
+        # (categories, version), reloaded once they are older than max_age
+        with self.lock:
+            if (self.loaded_at is not None and
+                    time.monotonic() - self.loaded_at < self.max_age):
+                return self.categories, self.version
+        self.load()
+        return self.categories, self.version
+
+
+category_registry = CategoryRegistry()
+
+
+def paginated_questions(request, query):
+    # one page of the questions of `query`, by id. ?page= skips to a page
+    # with OFFSET; ?after=<question id> starts after the last question of the
+    # previous page instead, which costs the same however deep it is.
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.filter(Question.id > after).order_by(Question.id)
+    else:
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            return []
+        query = query.order_by(Question.id).offset(
+          (page - 1) * QUESTIONS_PER_PAGE
+          )
+
+    questions = query.limit(QUESTIONS_PER_PAGE).all()
+    return [question.format() for question in questions]
+
+
+def total_questions(query, key=None):
+    # the number of questions of `query`, cached under `key` if one is given
+    if key is None:
+        return query.count()
+    return question_counts.get(key, query)
+
+
+def matching(search_term):
+    # questions containing `search_term`, ignoring case; LIKE wildcards in
+    # the term are matched literally
+    pattern = (search_term.replace('\\', '\\\\')
+               .replace('%', '\\%').replace('_', '\\_'))
+    return Question.question.ilike('%' + pattern + '%', escape='\\')
 
 
 def create_app(test_config=None):
     app = Flask(__name__)
+    app.config['QUIZ_REDIS_URL'] = os.environ.get('TRIVIA_QUIZ_REDIS_URL')
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
+    init_quiz_sessions(app)
 
     cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -39,27 +151,22 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def get_categories():
-        categories = Category.query.all()
-        if categories is None:
-            abort(404)
-
-        formatted_categories = {
-          category.id: category.type for category in categories
-          }
-
-        return jsonify({
+        # the registry version is the ETag, so a client sending it back in
+        # If-None-Match gets an empty 304 until the categories change
+        formatted_categories, version = category_registry.get()
+        response = jsonify({
           'success': True,
           'categories': formatted_categories
         })
+        response.set_etag(version)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     @app.route('/questions/')
     def get_questions():
-        questions_list = Question.query.order_by(Question.id).all()
-        ordered_questions = paginated_questions(request, questions_list)
+        ordered_questions = paginated_questions(request, Question.query)
 
-        formatted_categories = {
-          category.id: category.type for category in Category.query.all()
-          }
+        formatted_categories, _ = category_registry.get()
 
         if len(ordered_questions) == 0:
             abort(404)
@@ -67,7 +174,7 @@ def create_app(test_config=None):
         return jsonify({
           'success': True,
           'questions': ordered_questions,
-          'total_questions': len(questions_list),
+          'total_questions': total_questions(Question.query, 'all'),
           'current_category': None,
           'categories': formatted_categories
         })
@@ -83,14 +190,15 @@ def create_app(test_config=None):
                 abort(422)
 
             question.delete()
-            questions_list = Question.query.order_by(Question.id).all()
-            ordered_questions = paginated_questions(request, questions_list)
+            question_counts.clear()
+            quiz_engine.removed(question_id)
+            ordered_questions = paginated_questions(request, Question.query)
 
             return jsonify({
               'success': True,
               'deleted': question_id,
               'questions': ordered_questions,
-              'total_questions': len(questions_list),
+              'total_questions': total_questions(Question.query, 'all'),
             })
 
         except Exception:
@@ -117,6 +225,8 @@ def create_app(test_config=None):
             )
 
             question.insert()
+            question_counts.clear()
+            quiz_engine.added(question)
 
             return jsonify({
               'success': True,
@@ -129,18 +239,10 @@ def create_app(test_config=None):
     @app.route('/questions/search/', methods=['POST'])
     def search_questions():
         body = request.get_json()
-        word = body['searchTerm'].lower()
-        questions_list = []
-
-        for question in Question.query.order_by(Question.id).all():
-            if word in question.question.lower():
-                questions_list.append(question)
-
+        questions_list = Question.query.filter(matching(body['searchTerm']))
         ordered_questions = paginated_questions(request, questions_list)
 
-        formatted_categories = {
-          category.id: category.type for category in Category.query.all()
-          }
+        formatted_categories, _ = category_registry.get()
 
         if len(ordered_questions) == 0:
             abort(404)
@@ -148,62 +250,84 @@ def create_app(test_config=None):
         return jsonify({
           'success': True,
           'questions': ordered_questions,
-          'total_questions': len(questions_list),
+          'total_questions': total_questions(questions_list),
           'current_category': None,
           'categories': formatted_categories
         })
 
     @app.route('/categories/<int:category_id>/questions')
     def get_question_by_category(category_id):
-        questions_list = []
-
-        for question in Question.query.order_by(Question.id).all():
-            if category_id == question.category:
-                questions_list.append(question)
+        formatted_categories, _ = category_registry.get()
+        if category_id not in formatted_categories:
+            abort(404)
 
+        # answered from the (category, id) index, a page at a time
+        questions_list = Question.query.filter(
+          Question.category == category_id
+          )
         ordered_questions = paginated_questions(request, questions_list)
 
-        formatted_categories = {
-          category.id: category.type for category in Category.query.all()
-          }
-
         return jsonify({
           'success': True,
           'questions': ordered_questions,
-          'total_questions': len(questions_list),
-          'current_category': None,
+          'total_questions': total_questions(
+            questions_list, ('category', category_id)
+            ),
+          'current_category': category_id,
           'categories': formatted_categories
         })
 
     @app.route('/quizzes', methods=['POST'])
     def get_quiz_questions():
+        # the first call starts a quiz and returns its quiz_id; the next ones
+        # send the quiz_id and the answer to the last question, and the
+        # questions asked so far are remembered here
         body = request.get_json()
-        quiz_category = body['quiz_category']['id']
-        previous_questions = body['previous_questions']
-        questions = []
-
-        if quiz_category == 0:
-            questions_list = Question.query.all()
+        quiz_id = body.get('quiz_id')
+
+        if quiz_id is None:
+            try:
+                quiz_category = int(body['quiz_category']['id'])
+                previous_questions = set(body.get('previous_questions', []))
+            except (KeyError, TypeError, ValueError):
+                abort(400)
+
+            # clients sending previous_questions play without a session
+            if 'previous_questions' in body:
+                question = quiz_engine.pick(quiz_category, previous_questions)
+                return jsonify({
+                  'success': True,
+                  'question': (
+                    question.format() if question is not None else False
+                    )
+                })
+
+            quiz_id, quiz = quiz_sessions.start(quiz_category)
         else:
-            questions_list = (
-              Question.query.filter(Question.category == quiz_category).all()
-            )
-
-        for question in questions_list:
-            if question.id not in previous_questions:
-                questions.append(question)
-
-        current_questions = [question.format() for question in questions]
-
-        if len(current_questions) == 0:
-            question = False
-        else:
-            question = random.choice(current_questions)
-
-        return jsonify({
-          'success': True,
-          'question': question
-        })
+            quiz = quiz_sessions.get(str(quiz_id))
+            if quiz is None:
+                abort(404)
+
+        response = {'success': True, 'quiz_id': quiz_id}
+        if quiz['current'] is not None and 'answer' in body:
+            answered = Question.query.get(quiz['current'])
+            response['correct'] = answered is not None and is_correct(
+              answered.answer, str(body['answer'])
+              )
+            if response['correct']:
+                quiz['score'] += 1
+
+        question = quiz_engine.pick(quiz['category'], set(quiz['seen']))
+        quiz['current'] = question.id if question is not None else None
+        if question is not None:
+            quiz['seen'].append(question.id)
+        quiz_sessions.save(quiz_id, quiz)
+
+        response['question'] = (
+          question.format() if question is not None else False
+          )
+        response['score'] = quiz['score']
+        return jsonify(response)
 
     @app.errorhandler(404)
     def not_found(error):
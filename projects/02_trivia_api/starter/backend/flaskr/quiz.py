@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+
+from models import db, Question
+
+# quiz_category id meaning every category
+ALL_CATEGORIES = 0
+
+# seconds the question ids are trusted before they are read again, so
+# questions added by other processes join the quizzes
+QUIZ_MAX_AGE = 300
+
+# random draws tried before falling back to listing the unseen ids, which
+# only happens once nearly every question of the category has been seen
+MAX_DRAWS = 16
+
+
+class IdSet:
+    """Ids that can be added, removed and drawn at random in O(1)."""
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, id):
+        if id not in self.positions:
+            self.positions[id] = len(self.ids)
+            self.ids.append(id)
+
+    def discard(self, id):
+        # the last id takes the place of the removed one
+        position = self.positions.pop(id, None)
+        if position is None:
+            return
+        last = self.ids.pop()
+        if position < len(self.ids):
+            self.ids[position] = last
+            self.positions[last] = position
+
+    def draw(self):
+        return random.choice(self.ids)
+
+
+class QuizEngine:
+    """The ids of every question by category, kept in memory to pick quiz
+    questions without loading the category.
+
+    The create and delete handlers keep it current. A picked id whose
+    question has gone, deleted by another process, is dropped and another
+    one is picked.
+    """
+
+    def __init__(self, max_age=QUIZ_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.by_category = {}
+        self.categories = {}
+        self.loaded_at = None
+
+    def load(self):
+        by_category = {ALL_CATEGORIES: IdSet()}
+        categories = {}
+        for id, category in db.session.query(Question.id, Question.category):
+            by_category[ALL_CATEGORIES].add(id)
+            by_category.setdefault(category, IdSet()).add(id)
+            categories[id] = category
+        with self.lock:
+            self.by_category = by_category
+            self.categories = categories
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self):
+        return (self.loaded_at is None or
+                time.monotonic() - self.loaded_at > self.max_age)
+
+    def added(self, question):
+        # call after a question is created
+        if self.is_stale():
+            return
+        with self.lock:
+            self.by_category[ALL_CATEGORIES].add(question.id)
+            self.by_category.setdefault(question.category, IdSet()).add(
+                question.id)
+            self.categories[question.id] = question.category
+
+    def removed(self, question_id):
+        # call after a question is deleted
+        with self.lock:
+            if question_id not in self.categories:
+                return
+            category = self.categories.pop(question_id)
+            self.by_category[ALL_CATEGORIES].discard(question_id)
+            self.by_category[category].discard(question_id)
+
+    def draw(self, category, seen):
+        # a random id of `category` that is not in `seen`, or None
+        with self.lock:
+            ids = self.by_category.get(category)
+            if not ids:
+                return None
+            for _ in range(MAX_DRAWS):
+                id = ids.draw()
+                if id not in seen:
+                    return id
+            unseen = [id for id in ids.ids if id not in seen]
+        return random.choice(unseen) if unseen else None
+
+    def pick(self, category, seen):
+        # a random question of `category` (ALL_CATEGORIES for any) whose id
+        # is not in the set `seen`, or None once all of them have been seen
+        if self.is_stale():
+            self.load()
+        while True:
+            id = self.draw(category, seen)
+            if id is None:
+                return None
+            question = Question.query.get(id)
+            if question is not None:
+                return question
+            self.removed(id)
+
+
+quiz_engine = QuizEngine()
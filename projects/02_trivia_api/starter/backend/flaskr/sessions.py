@@ -0,0 +1,101 @@
+import json
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# seconds a quiz is kept after its last question
+QUIZ_SESSION_TTL = 3600
+
+# the most quizzes one process keeps in memory; the least recently played
+# are dropped first
+QUIZ_SESSION_MAX_ENTRIES = 10000
+
+
+class MemoryStore:
+    """Per-process store of quiz states; entries expire `ttl` seconds after
+    they were last saved."""
+
+    def __init__(self, ttl=QUIZ_SESSION_TTL, max_entries=QUIZ_SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            state, expires = item
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            return state
+
+    def set(self, key, state):
+        # entries stay ordered by expiry, so the expired ones are at the front
+        now = time.monotonic()
+        with self.lock:
+            self.entries[key] = (state, now + self.ttl)
+            self.entries.move_to_end(key)
+            while self.entries and (
+                    len(self.entries) > self.max_entries or
+                    next(iter(self.entries.values()))[1] < now):
+                self.entries.popitem(last=False)
+
+
+class RedisStore:
+    """Quiz states shared by every process, as JSON in redis."""
+
+    def __init__(self, client, ttl=QUIZ_SESSION_TTL, prefix='trivia:quiz:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, state):
+        self.client.set(self.prefix + key, json.dumps(state), ex=self.ttl)
+
+
+def is_correct(answer, guess):
+    # the frontend's rule: the guess, without punctuation, is one of the
+    # words of the answer
+    guess = re.sub(r'[.,/#!$%^&*;:{}=\-_`~()]', '', guess).lower()
+    return guess in answer.lower().split(' ')
+
+
+class QuizSessions:
+    """Quizzes in play, by id: the category, the ids of the questions asked,
+    the question being answered and the score."""
+
+    def __init__(self, store=None):
+        self.store = store or MemoryStore()
+
+    def start(self, category):
+        quiz_id = secrets.token_urlsafe(16)
+        state = {'category': category, 'seen': [], 'current': None,
+                 'score': 0}
+        return quiz_id, state
+
+    def get(self, quiz_id):
+        return self.store.get(quiz_id)
+
+    def save(self, quiz_id, state):
+        self.store.set(quiz_id, state)
+
+
+quiz_sessions = QuizSessions()
+
+
+def init_quiz_sessions(app):
+    # TRIVIA_QUIZ_REDIS_URL shares quizzes between processes; redis is only
+    # needed when it is set
+    redis_url = app.config.get('QUIZ_REDIS_URL')
+    if redis_url:
+        import redis
+        quiz_sessions.store = RedisStore(redis.Redis.from_url(redis_url))
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -28,9 +28,15 @@ class Question(db.Model):
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(
+    Integer,
+    ForeignKey('categories.id', name='category', onupdate='CASCADE', ondelete='SET NULL')
+  )
   difficulty = Column(Integer)
 
+  # a category's questions in id order, for the paginated category listing
+  __table_args__ = (Index('ix_questions_category', 'category', 'id'),)
+
   def __init__(self, question, answer, category, difficulty):
     self.question = question
     self.answer = answer
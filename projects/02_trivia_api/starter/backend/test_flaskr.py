@@ -2,9 +2,12 @@ import os
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from flaskr import create_app
-from models import setup_db, Question, Category
+from flaskr import create_app, category_registry
+from flaskr.sessions import MemoryStore
+from models import setup_db, db, Question, Category
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -66,6 +69,50 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['categories'])
 
+    def test_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories',
+                                headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_categories_served_from_memory(self):
+        self.client().get('/categories')
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', count)
+        try:
+            res = self.client().get('/questions/')
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse([s for s in statements if 'categories' in s])
+
+    def test_categories_refreshed_when_changed(self):
+        etag = self.client().get('/categories').headers['ETag']
+
+        with self.app.app_context():
+            category = Category(type='Music')
+            db.session.add(category)
+            db.session.commit()
+            category_registry.invalidate()
+            res = self.client().get('/categories',
+                                    headers={'If-None-Match': etag})
+            data = json.loads(res.data)
+            db.session.delete(category)
+            db.session.commit()
+            category_registry.invalidate()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Music', data['categories'].values())
+
     def test_405_invalid_method(self):
         res = self.client().patch('/categories')
         data = json.loads(res.data)
@@ -93,6 +140,35 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertTrue(data['message'], 'Resource Not Found')
 
+    def test_get_questions_after_cursor(self):
+        res = self.client().get('/questions/?page=1')
+        first_page = json.loads(res.data)['questions']
+        res = self.client().get('/questions/?page=2')
+        second_page = json.loads(res.data)['questions']
+
+        res = self.client().get(
+            '/questions/?after=' + str(first_page[-1]['id']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(data['questions'], second_page)
+
+    def test_total_questions_follows_writes(self):
+        res = self.client().get('/questions/')
+        total = json.loads(res.data)['total_questions']
+
+        res = self.client().post('/questions', json=self.new_question)
+        created_id = json.loads(res.data)['created']
+        res = self.client().get('/questions/')
+        total_after_create = json.loads(res.data)['total_questions']
+
+        res = self.client().delete('/questions/' + str(created_id))
+        total_after_delete = json.loads(res.data)['total_questions']
+
+        self.assertEqual(total_after_create, total + 1)
+        self.assertEqual(total_after_delete, total)
+
     def test_delete_question(self):
         res = self.client().post('/questions', json=self.new_question)
         data = json.loads(res.data)
@@ -162,9 +238,28 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['questions'])
         self.assertTrue(data['total_questions'])
-        self.assertEqual(data['current_category'], None)
+        self.assertEqual(data['current_category'], 2)
         self.assertTrue(data['categories'])
 
+    def test_question_by_category_only_lists_category(self):
+        res = self.client().get('/categories/3/questions')
+        data = json.loads(res.data)
+
+        with self.app.app_context():
+            total = Question.query.filter(Question.category == 3).count()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], total)
+        self.assertTrue(all(q['category'] == 3 for q in data['questions']))
+
+    def test_404_if_category_does_not_exist(self):
+        res = self.client().get('/categories/1001/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertTrue(data['message'], 'Resource Not Found')
+
     def test_category_405_if_invalid_method(self):
         res = self.client().delete('/categories/1001/questions')
         data = json.loads(res.data)
@@ -181,6 +276,124 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['question'])
 
+    def test_quiz_skips_previous_questions(self):
+        with self.app.app_context():
+            ids = [id for id, in db.session.query(Question.id).filter(
+                Question.category == 1)]
+
+        res = self.client().post('/quizzes', json={
+            'quiz_category': {'id': 1},
+            'previous_questions': ids[1:]
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['question']['id'], ids[0])
+
+        res = self.client().post('/quizzes', json={
+            'quiz_category': {'id': 1},
+            'previous_questions': ids
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(data['question'], False)
+
+    def test_quiz_follows_created_and_deleted_questions(self):
+        question = dict(self.new_question, category=6)
+        with self.app.app_context():
+            ids = [id for id, in db.session.query(Question.id).filter(
+                Question.category == 6)]
+        quiz = {'quiz_category': {'id': 6}, 'previous_questions': ids}
+        self.client().post('/quizzes', json=quiz)
+
+        res = self.client().post('/questions', json=question)
+        created_id = json.loads(res.data)['created']
+        res = self.client().post('/quizzes', json=quiz)
+        picked = json.loads(res.data)['question']
+        self.client().delete('/questions/' + str(created_id))
+        res = self.client().post('/quizzes', json=quiz)
+        picked_after_delete = json.loads(res.data)['question']
+
+        self.assertEqual(picked['id'], created_id)
+        self.assertEqual(picked_after_delete, False)
+
+    def test_quiz_skips_questions_deleted_elsewhere(self):
+        question = dict(self.new_question, category=6)
+        with self.app.app_context():
+            ids = [id for id, in db.session.query(Question.id).filter(
+                Question.category == 6)]
+        quiz = {'quiz_category': {'id': 6}, 'previous_questions': ids}
+
+        res = self.client().post('/questions', json=question)
+        created_id = json.loads(res.data)['created']
+        with self.app.app_context():
+            Question.query.filter(Question.id == created_id).delete()
+            db.session.commit()
+        res = self.client().post('/quizzes', json=quiz)
+        data = json.loads(res.data)
+
+        self.assertEqual(data['question'], False)
+
+    def test_400_if_quiz_category_is_invalid(self):
+        res = self.client().post('/quizzes', json={
+            'quiz_category': {'id': 'art'},
+            'previous_questions': []
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
+    def test_quiz_session_asks_each_question_once(self):
+        with self.app.app_context():
+            total = Question.query.filter(Question.category == 1).count()
+
+        res = self.client().post('/quizzes', json={'quiz_category': {'id': 1}})
+        data = json.loads(res.data)
+        quiz_id = data['quiz_id']
+        asked = []
+        while data['question']:
+            asked.append(data['question']['id'])
+            res = self.client().post('/quizzes', json={'quiz_id': quiz_id})
+            data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(asked), total)
+        self.assertEqual(len(set(asked)), total)
+
+    def test_quiz_session_keeps_score(self):
+        res = self.client().post('/quizzes', json={'quiz_category': {'id': 0}})
+        data = json.loads(res.data)
+        quiz_id = data['quiz_id']
+        answer = data['question']['answer'].split(' ')[0]
+
+        res = self.client().post('/quizzes',
+                                 json={'quiz_id': quiz_id, 'answer': answer})
+        right = json.loads(res.data)
+        res = self.client().post('/quizzes',
+                                 json={'quiz_id': quiz_id, 'answer': '____'})
+        wrong = json.loads(res.data)
+
+        self.assertEqual(data['score'], 0)
+        self.assertEqual(right['correct'], True)
+        self.assertEqual(right['score'], 1)
+        self.assertEqual(wrong['correct'], False)
+        self.assertEqual(wrong['score'], 1)
+
+    def test_404_if_quiz_session_does_not_exist(self):
+        res = self.client().post('/quizzes', json={'quiz_id': 'unknown'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_quiz_sessions_expire(self):
+        store = MemoryStore(ttl=-1)
+        store.set('quiz', {'seen': []})
+
+        self.assertEqual(store.get('quiz'), None)
+        self.assertEqual(len(store.entries), 0)
+
     def test_quizzes_405_if_invalid_method(self):
         res = self.client().get('/quizzes', json=self.category)
         data = json.loads(res.data)
@@ -10,6 +10,7 @@ class QuizView extends Component {
     super();
     this.state = {
         quizCategory: null,
+        quizId: null,
         previousQuestions: [],
         showAnswer: false,
         categories: {},
@@ -52,8 +53,10 @@ class QuizView extends Component {
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
-      data: JSON.stringify({
-        previous_questions: previousQuestions,
+      data: JSON.stringify(this.state.quizId ? {
+        quiz_id: this.state.quizId,
+        answer: this.state.guess
+      } : {
         quiz_category: this.state.quizCategory
       }),
       xhrFields: {
@@ -62,6 +65,7 @@ class QuizView extends Component {
       crossDomain: true,
       success: (result) => {
         this.setState({
+          quizId: result.quiz_id,
           showAnswer: false,
           previousQuestions: previousQuestions,
           currentQuestion: result.question,
@@ -90,6 +94,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      quizId: null,
       previousQuestions: [],
       showAnswer: false,
       numCorrect: 0,